@@ -0,0 +1,127 @@
+#! /usr/bin/env python3
+"""Runs many evaluations in one warm process, or in a pool of them.
+
+Every evaluate.py run imports Qiskit, scipy and sklearn and loads its problem
+from scratch, which can take longer than the training itself. This driver
+imports everything once, keeps the problems it has loaded (and the caches of
+the simulator, see statevector) between jobs, and appends one JSON line per
+job to a single results file.
+
+The manifest is a JSON list of jobs, or a file with one JSON job per line:
+
+    {"solver": "discrete_solver", "problem": "discrete_problem3", "sample_limit": 200, "seed": 0}
+
+sample_limit and seed are optional. Run it with:
+
+    ./batch.py manifest.json --results results.jsonl --workers 4
+
+With more than one worker the jobs are run by a pool of processes, forked after
+the imports so that they start warm as well.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+import evaluate
+import example_solutions
+from example_solutions import instrumentation
+from problem_store import load_problem
+
+
+def read_manifest(path):
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_problem(problem_name):
+    # memory-mapped for converted problems (see problem_store.py), so cheap to keep.
+    return load_problem(problem_name)
+
+
+def run_job(index, job, verbose=False):
+    """Evaluates one job and returns its JSON record, with "status" "ok" or "error"."""
+    record = {"job": index, **job}
+    try:
+        with contextlib.ExitStack() as stack:
+            if not verbose:
+                stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+            instrumentation.reset()
+            with instrumentation.timer("load_problem"):
+                problem = _cached_problem(job["problem"])
+            result = evaluate.evaluate(problem, job["problem"], job["solver"], job.get("sample_limit"),
+                                       seed=job.get("seed"))
+    except Exception:
+        record.update(status="error", error=traceback.format_exc())
+        return record
+
+    if result is None:
+        record.update(status="error", error="no inference function")
+    else:
+        # the same for every job of a solver, and long.
+        del result["source_code"]
+        record.update(status="ok", **result)
+    return record
+
+
+def run_batch(jobs, results_path, workers=1, verbose=False):
+    """Runs the jobs and appends their records to results_path as they finish."""
+    # the solvers (and Qiskit etc.) are imported once, before any worker is forked.
+    for solver in {job["solver"] for job in jobs}:
+        if solver in example_solutions.SOLVERS:
+            example_solutions.get_solver(solver)
+
+    with open(results_path, "a") as results:
+
+        def store(record):
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+            if record["status"] == "ok":
+                print(f"job {record['job']}: {record['solver']} on {record['problem']}, "
+                      f"test accuracy {record['test_accuracy']:.2f}%, trained in {record['training_time']:.2f}s")
+            else:
+                print(f"job {record['job']}: {record['solver']} on {record['problem']} FAILED: "
+                      f"{record['error'].strip().splitlines()[-1]}")
+
+        if workers == 1:
+            for index, job in enumerate(jobs):
+                store(run_job(index, job, verbose))
+            return
+
+        start_methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in start_methods else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [pool.submit(run_job, index, job, verbose) for index, job in enumerate(jobs)]
+            for future in futures:
+                store(future.result())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the evaluation jobs of a manifest.')
+    parser.add_argument('manifest',
+                        help='JSON list of jobs, or one JSON job per line.')
+    parser.add_argument('--results', default='results.jsonl',
+                        help='File the job records are appended to, one JSON object per line.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes, 1 runs every job in this process.')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Show the output of the solvers.')
+    args = parser.parse_args()
+
+    jobs = read_manifest(args.manifest)
+    t0 = time.time()
+    run_batch(jobs, args.results, args.workers, args.verbose)
+    print(f"Ran {len(jobs)} jobs in {time.time() - t0:.1f} seconds, results appended to {args.results}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#! /usr/bin/env python3
+"""Benchmarks the example solvers on the bundled problems.
+
+Every combination of problem, solver and sample limit is trained and scored
+--trials times, with the seeds --seed, --seed + 1, ... Each run gets a fresh
+process, so neither the caches of one run nor its peak memory carry over to
+the next. For every run the training time, inference throughput (test vectors
+per second), accuracies and peak memory are saved to --output, together with
+a summary (medians over the trials) per combination.
+
+    ./benchmark.py                                  # everything
+    ./benchmark.py --solvers discrete_solver --problems discrete_problem3 -n 20 200 --trials 5
+    ./benchmark.py --save_baseline                  # also store the summary as the new baseline
+
+The summary is compared with the TimeEst of each problem and with the baseline
+(benchmark_baseline.json by default): a combination that trains or predicts more
+than --threshold times slower than in the baseline is reported as a regression,
+and the exit status is then 1.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import traceback
+import numpy as np
+
+from example_solutions import SOLVERS
+
+SAMPLE_LIMITS = (20, 200)
+
+
+def bundled_problems():
+    names = {os.path.splitext(path)[0] for pattern in ("discrete_problem*", "continuous_problem*")
+             for path in glob.glob(pattern + ".pyz") + glob.glob(pattern + ".problem")}
+    return sorted(names)
+
+
+def _run(problem_name, solver, sample_limit, seed):
+    # in a fresh process, see run_benchmark.
+    import evaluate
+    from example_solutions import instrumentation
+    from problem_store import load_problem
+
+    run = {"problem": problem_name, "solver": solver, "sample_limit": sample_limit, "seed": seed}
+    try:
+        # the solvers print a lot.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            instrumentation.reset()
+            with instrumentation.timer("load_problem"):
+                problem = load_problem(problem_name)
+            result = evaluate.evaluate(problem, problem_name, solver, sample_limit, seed=seed)
+    except Exception:
+        run.update(status="error", error=traceback.format_exc(limit=-1).strip())
+        return run
+    if result is None:
+        run.update(status="error", error="no inference function")
+        return run
+
+    run.update(status="ok",
+               sample_limit=result["training_vectors_limit"],
+               training_time=result["training_time"],
+               inference_throughput=result["inference_throughput"],
+               training_accuracy=result["training_accuracy"],
+               test_accuracy=result["test_accuracy"],
+               peak_rss_mb=result["profile"]["peak_rss_mb"],
+               time_estimate=result["time_estimate"])
+    return run
+
+
+def run_benchmark(problems, solvers, sample_limits, trials, seed):
+    runs = []
+    ctx = multiprocessing.get_context("spawn")
+    for problem_name in problems:
+        for solver in solvers:
+            for sample_limit in sample_limits:
+                for trial in range(trials):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                        run = pool.submit(_run, problem_name, solver, sample_limit, seed + trial).result()
+                    run["trial"] = trial
+                    runs.append(run)
+                    print(_describe_run(run), flush=True)
+    return runs
+
+
+def _describe_run(run):
+    name = f"{run['problem']:22s} {run['solver']:18s} n={run['sample_limit']:<5d} seed={run['seed']:<4d}"
+    if run["status"] != "ok":
+        return f"{name} FAILED: {run['error'].splitlines()[-1]}"
+    return (f"{name} train {run['training_time']:8.2f}s  infer {run['inference_throughput'] or 0:10.0f}/s  "
+            f"test accuracy {run['test_accuracy']:6.2f}%  {run['peak_rss_mb']:7.1f}MB")
+
+
+def summarize(runs):
+    """Medians over the trials of each (problem, solver, sample_limit), keyed by "problem/solver/n"."""
+    groups = {}
+    for run in runs:
+        if run["status"] == "ok":
+            key = f"{run['problem']}/{run['solver']}/{run['sample_limit']}"
+            groups.setdefault(key, []).append(run)
+
+    summary = {}
+    for key, group in groups.items():
+        throughputs = [run["inference_throughput"] for run in group if run["inference_throughput"]]
+        time_estimate = group[0]["time_estimate"]
+        training_time = float(np.median([run["training_time"] for run in group]))
+        summary[key] = {
+            "trials": len(group),
+            "training_time": training_time,
+            "inference_throughput": float(np.median(throughputs)) if throughputs else None,
+            "training_accuracy": float(np.median([run["training_accuracy"] for run in group])),
+            "test_accuracy": float(np.median([run["test_accuracy"] for run in group])),
+            "peak_rss_mb": float(max(run["peak_rss_mb"] for run in group)),
+            "time_estimate": time_estimate,
+            "within_time_estimate": None if time_estimate is None else training_time <= time_estimate,
+        }
+    return summary
+
+
+def regressions(summary, baseline, threshold):
+    """Descriptions of the combinations that got more than threshold times slower than in baseline."""
+    found = []
+    for key, now in sorted(summary.items()):
+        then = baseline.get(key)
+        if then is None:
+            continue
+        # a few milliseconds of noise are not a regression.
+        if now["training_time"] > threshold * then["training_time"] + 0.01:
+            found.append(f"{key}: training took {now['training_time']:.2f}s, was {then['training_time']:.2f}s")
+        if now["inference_throughput"] and then["inference_throughput"] \
+                and now["inference_throughput"] * threshold < then["inference_throughput"]:
+            found.append(f"{key}: inference at {now['inference_throughput']:.0f}/s, "
+                         f"was {then['inference_throughput']:.0f}/s")
+        if now["test_accuracy"] < then["test_accuracy"]:
+            found.append(f"{key}: test accuracy {now['test_accuracy']:.2f}%, was {then['test_accuracy']:.2f}%")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the example solvers on the bundled problems.')
+    parser.add_argument('--problems', nargs='+', default=None,
+                        help='Problems to run, all discrete_problem* and continuous_problem* files by default.')
+    parser.add_argument('--solvers', nargs='+', default=sorted(SOLVERS), choices=sorted(SOLVERS),
+                        help='Solver functions from example_solutions to run.')
+    parser.add_argument('--sample_limits', "-n", nargs='+', type=int, default=SAMPLE_LIMITS,
+                        help='Numbers of training vectors to try.')
+    parser.add_argument('--trials', type=int, default=3,
+                        help='Number of runs of every combination.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the first trial, the following trials use the next seeds.')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='File to save all runs and the summary to.')
+    parser.add_argument('--baseline', default='benchmark_baseline.json',
+                        help='Summary of an earlier run to compare with.')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Slowdown factor compared with the baseline that counts as a regression.')
+    parser.add_argument('--save_baseline', action='store_true',
+                        help='Save the summary of this run as the baseline.')
+    args = parser.parse_args()
+
+    problems = args.problems if args.problems is not None else bundled_problems()
+    runs = run_benchmark(problems, args.solvers, args.sample_limits, args.trials, args.seed)
+    summary = summarize(runs)
+
+    with open(args.output, "w") as f:
+        json.dump({"runs": runs, "summary": summary}, f, indent=4)
+    print(f"Results saved to {args.output}.")
+
+    for key, entry in sorted(summary.items()):
+        if entry["within_time_estimate"] is False:
+            print(f"Slower than TimeEst: {key} trained in {entry['training_time']:.2f}s, "
+                  f"TimeEst is {entry['time_estimate']}s")
+
+    found = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            found = regressions(summary, json.load(f), args.threshold)
+        for description in found:
+            print(f"REGRESSION {description}")
+        print(f"{len(found)} regressions compared with {args.baseline}.")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(summary, f, indent=4)
+        print(f"Baseline saved to {args.baseline}.")
+
+    sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,156 +5,314 @@ import warnings
 warnings.filterwarnings("ignore")
 
 import argparse
-import pickle
 import sys
 import os
 import time
 import json
 import re
 import inspect
+import glob
+import random
+import signal
 import traceback
 import numpy as np
 
 import example_solutions as trialmodule
 from example_solutions.helper_functions import print_circuit
+from example_solutions import instrumentation
+from example_solutions import progress
+from problem_store import load_problem, problem_path
+from training_cache import TrainingCache
+from example_solutions.checkpoint import Checkpoint
 
-parser = argparse.ArgumentParser(description='Tests your solutions for the quantum classification problem.')
-parser.add_argument('--solution_function_name', "--fun", metavar='S', type=str,
-                    help='The name of your function in small_circuits.py')
-parser.add_argument('--print_problem_stats', "--stats", action='store_true',
-                    help='Prints some statistics about the training data and the problem.')
-parser.add_argument('--cheat', action='store_true',
-                    help='Prints the transformation circuit. DEBUG ONLY.')
-parser.add_argument('--problem', dest='problem', action='store',
-                    default="discrete_problem0",
-                    help='Name of the problem to test against.')
-parser.add_argument('--sample_limit', "-n", action='store', type=int,
-                    help='Number of training vectors to use - if your solution uses the hints, you can probably make this very small (~10) and train much more quickly.')
+DEFAULT_SAMPLE_LIMIT = 20
 
-args = parser.parse_args()
 
-fname = args.problem if "pyz" in args.problem else args.problem+".pyz"
+def getcost(fn, vectors, labels, batch_fn=None, chunk_size=4096):
+    """Percentage of correctly predicted labels.
 
-with open(fname, "rb") as f:
-    problem = pickle.load(f)
-
-print("########## Problem hint: ####################")
-print(problem["Hint"], end="")
-if problem["Hint"][-1] != "\n":
-    print()
-print("########## Now running your code ############")
-
-if args.print_problem_stats:
-    print(f"number of training samples: {len(problem['TrainSamples'])}")
-    print(f"label bias (sum/number): {sum(problem['TrainLabels']) / len(problem['TrainLabels'])}")
-    print(f"Training ETA: {problem['TimeEst']}")
-
-if args.sample_limit is None:
-    sample_limit = min(len(problem['TrainSamples']), 20)
-else:
-    sample_limit = min(len(problem['TrainSamples']), args.sample_limit)
-
-print(f"using {sample_limit} training examples out of {len(problem['TrainSamples'])}. change this with -n NUMBER.")
-
-if args.cheat:
-    from pprint import pprint
-    pprint(problem)
-
-if args.solution_function_name is None:
-    print("Please provide the name of your proposed solution function as --fun [NAME] to evaluate. exiting.")
-    sys.exit(0)
-
-proposed_solution = trialmodule.__dict__[args.solution_function_name]
-
-print(f"using {proposed_solution}")
-
-t0 = time.time()
-traindata = list(zip(problem["TrainSamples"], problem["TrainLabels"]))[:sample_limit]
-traindata = list(traindata)
-trained_result = proposed_solution( traindata )
-dt = time.time() - t0
-
-predictfn = trained_result["infer_fun"]
-
-if not callable(predictfn):
-    print("Your training function needs to return a dict from inference_retval!")
-    sys.exit(0)
-
-
-def getcost(fn, vectors, labels):
+    The vectors are read and scored chunk_size at a time, so that a memory-mapped
+    test set (see problem_store.py) never has to be in memory all at once. With a
+    batch_fn (the optional "infer_batch" of inference_retval) each chunk is
+    predicted in one call, otherwise fn is called for every vector.
+    """
     acc = 0.0
-    for vec, label in zip(vectors, labels):
-        p = fn(vec)
-        p = 1 if p>0 else -1 # round the result
-        if (p == label):
-            acc += 1
+    for start in range(0, len(labels), chunk_size):
+        chunk_vectors = vectors[start:start + chunk_size]
+        chunk_labels = np.asarray(labels[start:start + chunk_size])
+
+        if batch_fn is not None:
+            p = np.asarray(batch_fn(np.asarray(chunk_vectors, dtype=complex)))
+            instrumentation.count("infer_batch_calls")
+        else:
+            p = np.array([fn(vec) for vec in chunk_vectors])
+            instrumentation.count("infer_calls", len(p))
+        p = np.where(p > 0, 1, -1) # round the result
+        acc += np.count_nonzero(p == chunk_labels)
 
     acc *= 100/len(labels)
     return acc
 
 
-training_accuracy = getcost(predictfn, problem["TrainSamples"][:sample_limit], problem["TrainLabels"][:sample_limit])
-test_accuracy = getcost(predictfn, problem["TestVectors"], problem["TestLabels"])
-
-
-#test_error = 0.0
-#for testvec, testres in zip(problem["TestVectors"], problem["TestLabels"]):
-#    p = predictfn(testvec)
-#    test_error += abs(p-testres)
-    # if abs(p-testres) > 0.0001:
-    #     print(p, testres, testvec)
-#accuracy_percentage = test_error/len(problem["TestVectors"]) * 100
-
-## Now we have evaluated the users solution, we need to package up as much metadata
-## as possible for later grading.
-
-try:
-    source = inspect.getsource(proposed_solution)
-except Exception as e:
-    print("failed to get source code for solution.")
-    print(traceback.format_exc())
-    source = None
-
-circuit = trained_result["infer_circ"]
-if circuit:
-    circuit_str = print_circuit(circuit, num_qubits = int(np.log2(len(problem["TestVectors"][0]))) )
-else:
-    print("No circuit is available for this solution")
-    circuit_str = None
-
-problem_name    = args.problem[0:-4] if args.problem.endswith('.pyz') else args.problem
-match_obj       = re.match('\D+(\d+)', problem_name)
-problem_index   = int(match_obj.group(1)) if match_obj else -1
-
-result_dict = {
-    "problem_name":problem_name,
-    "problem_index":problem_index,
-
-    "training_vectors_limit":sample_limit,
-    "solution_function_name":args.solution_function_name,
-    "source_code":source,
-    "circuit_str":circuit_str,
-    "training_time":dt,
-    "training_accuracy":training_accuracy,
-    "test_accuracy":test_accuracy,
-}
-
-## Create a unique name for the JSON output file
-#
-output_fileprefix = '_'.join(['solution_to', problem_name, 'by', args.solution_function_name])
-idx = 0
-while os.path.exists( f'{output_fileprefix}_{idx}.json' ):
-    idx += 1
-output_filename = f'{output_fileprefix}_{idx}.json'
-
-## Record the results in that JSON file:
-#
-with open(output_filename, "w") as f:
-    json.dump(result_dict, f, indent=4)
-
-print(f"Training accuracy: {training_accuracy:.2f}%, taking {dt:.1f} seconds to train. Test accuracy: {test_accuracy:.2f}%")
-
-#if dt > problem["TimeEst"]:
-#    print(f"It took more than {problem['TimeEst']} seconds to train your solution - we are sure there is a better method!")
-
-print(f"Run saved to {fname}.\nUpload with:\n\tck store_experiment qml --json_file={output_filename}")
+def problem_identity(problem_path):
+    """The problem name and index, e.g. ("discrete_problem3", 3), for a problem name or path."""
+    problem_name    = os.path.splitext(problem_path.rstrip(os.sep))[0]
+    match_obj       = re.match(r'\D+(\d+)', problem_name)
+    problem_index   = int(match_obj.group(1)) if match_obj else -1
+    return problem_name, problem_index
+
+
+def evaluate(problem, problem_path, solution_function_name, sample_limit=None, seed=None,
+             chunk_size=4096, profile=None, cache=None, checkpoint_dir=None, resume=False,
+             checkpoint_interval=30.0):
+    """Trains a solution on a problem and scores it on the training and test sets.
+
+    problem: the problem dict, see problem_store.load_problem.
+    problem_path: the name or path the problem was loaded from.
+    sample_limit: number of training vectors to use, 20 by default.
+    seed: seeds numpy's and Python's random number generators before training.
+    profile: file name to save cProfile stats of training and scoring to.
+    cache: a training_cache.TrainingCache to reuse the result of an earlier identical training,
+           only used with a seed.
+    checkpoint_dir: if the solution takes a checkpoint argument, save its progress to a
+                    file in this directory every checkpoint_interval seconds.
+    resume: continue from the checkpoint left by an interrupted run.
+    returns: the result dict that is saved to the solution_to_*.json file, or None
+             if the solution did not return an inference function. Its "profile"
+             is everything instrumentation recorded since the caller's last reset().
+    """
+    if sample_limit is None:
+        sample_limit = min(len(problem['TrainSamples']), DEFAULT_SAMPLE_LIMIT)
+    else:
+        sample_limit = min(len(problem['TrainSamples']), sample_limit)
+
+    print(f"using {sample_limit} training examples out of {len(problem['TrainSamples'])}. change this with -n NUMBER.")
+
+    # the solver's module, and Qiskit etc. with it, is only imported here.
+    proposed_solution = trialmodule.get_solver(solution_function_name)
+
+    print(f"using {proposed_solution}")
+
+    # search status lines show the time against the problem's estimate.
+    progress.configure(time_estimate=problem.get("TimeEst"))
+
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    with instrumentation.profiled(profile):
+        t0 = time.time()
+        traindata = list(zip(problem["TrainSamples"][:sample_limit], problem["TrainLabels"][:sample_limit]))
+
+        cached = None
+        if cache is not None and seed is None:
+            # an unseeded training is random, rerunning it should give a new result.
+            print("not using the training cache without --seed.")
+            cache = None
+        if cache is not None:
+            cache_key = cache.key(proposed_solution, problem["TrainSamples"][:sample_limit],
+                                  problem["TrainLabels"][:sample_limit], seed)
+            cached = cache.load(cache_key)
+
+        if cached is not None:
+            print(f"using the cached training result {cache_key}, rerun with --no_cache to train again.")
+            trained_result = cached["artifact"]()
+            dt = cached["training_time"]
+        else:
+            kwargs = {}
+            if checkpoint_dir is not None and "checkpoint" in inspect.signature(proposed_solution).parameters:
+                problem_name, _ = problem_identity(problem_path)
+                checkpoint_path = os.path.join(checkpoint_dir, f"{problem_name}_{solution_function_name}_n{sample_limit}_seed{seed}.ckpt")
+                kwargs["checkpoint"] = Checkpoint(checkpoint_path, checkpoint_interval, resume)
+
+            with instrumentation.timer("training"):
+                trained_result = proposed_solution( traindata, **kwargs )
+            dt = time.time() - t0
+            if "checkpoint" in kwargs:
+                kwargs["checkpoint"].remove()
+            if cache is not None and trained_result.get("artifact") is not None:
+                cache.store(cache_key, trained_result["artifact"], dt)
+
+        predictfn = trained_result["infer_fun"]
+
+        if not callable(predictfn):
+            print("Your training function needs to return a dict from inference_retval!")
+            return None
+
+        batchfn = trained_result.get("infer_batch")
+        with instrumentation.timer("training_accuracy"):
+            training_accuracy = getcost(predictfn, problem["TrainSamples"][:sample_limit], problem["TrainLabels"][:sample_limit], batchfn, chunk_size)
+        with instrumentation.timer("test_accuracy"):
+            test_accuracy = getcost(predictfn, problem["TestVectors"], problem["TestLabels"], batchfn, chunk_size)
+
+    if profile:
+        print(f"Profile saved to {profile}, view it with: python -m pstats {profile}")
+
+    ## Now we have evaluated the users solution, we need to package up as much metadata
+    ## as possible for later grading.
+
+    try:
+        source = inspect.getsource(proposed_solution)
+    except Exception as e:
+        print("failed to get source code for solution.")
+        print(traceback.format_exc())
+        source = None
+
+    circuit = trained_result["infer_circ"]
+    if circuit:
+        with instrumentation.timer("circuit_drawing"):
+            circuit_str = print_circuit(circuit, num_qubits = int(np.log2(len(problem["TestVectors"][0]))) )
+    else:
+        print("No circuit is available for this solution")
+        circuit_str = None
+
+    problem_name, problem_index = problem_identity(problem_path)
+    test_time = instrumentation.report()["timers"]["test_accuracy"]
+
+    return {
+        "problem_name":problem_name,
+        "problem_index":problem_index,
+
+        "training_vectors_limit":sample_limit,
+        "solution_function_name":solution_function_name,
+        "seed":seed,
+        "source_code":source,
+        "circuit_str":circuit_str,
+        "training_time":dt,
+        # True if the training result (and training_time) came from the training cache.
+        "training_cached":cached is not None,
+        "time_estimate":problem.get("TimeEst"),
+        "training_accuracy":training_accuracy,
+        "test_accuracy":test_accuracy,
+        # test vectors predicted per second.
+        "inference_throughput":len(problem["TestLabels"]) / test_time if test_time > 0 else None,
+
+        # seconds per phase, counts of simulator runs / objective evaluations / ..., peak memory.
+        "profile":instrumentation.report(),
+    }
+
+
+def save_result(result_dict):
+    """Writes the result to a new solution_to_PROBLEM_by_FUNCTION_IDX.json file and returns its name."""
+
+    ## Create a unique name for the JSON output file
+    #
+    output_fileprefix = '_'.join(['solution_to', result_dict["problem_name"], 'by', result_dict["solution_function_name"]])
+    pattern = re.compile(re.escape(output_fileprefix) + r'_(\d+)\.json$')
+    existing = (pattern.match(path) for path in glob.glob(glob.escape(output_fileprefix) + '_*.json'))
+    idx = max((int(match.group(1)) for match in existing if match), default=-1) + 1
+
+    ## Record the results in that JSON file. Mode "x" fails rather than overwrite
+    ## a file that another run created in the meantime.
+    #
+    while True:
+        output_filename = f'{output_fileprefix}_{idx}.json'
+        try:
+            with open(output_filename, "x") as f:
+                json.dump(result_dict, f, indent=4)
+            return output_filename
+        except FileExistsError:
+            idx += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tests your solutions for the quantum classification problem.')
+    parser.add_argument('--solution_function_name', "--fun", metavar='S', type=str,
+                        help='The name of your function in small_circuits.py')
+    parser.add_argument('--print_problem_stats', "--stats", action='store_true',
+                        help='Prints some statistics about the training data and the problem.')
+    parser.add_argument('--list_solvers', action='store_true',
+                        help='Lists the example solution functions and exits.')
+    parser.add_argument('--cheat', action='store_true',
+                        help='Prints the transformation circuit. DEBUG ONLY.')
+    parser.add_argument('--problem', dest='problem', action='store',
+                        default="discrete_problem0",
+                        help='Name of the problem to test against.')
+    parser.add_argument('--sample_limit', "-n", action='store', type=int,
+                        help='Number of training vectors to use - if your solution uses the hints, you can probably make this very small (~10) and train much more quickly.')
+    parser.add_argument('--chunk_size', action='store', type=int, default=4096,
+                        help='Number of test vectors read from disk and scored at a time.')
+    parser.add_argument('--profile', metavar='FILE', action='store',
+                        help='Run training and scoring under cProfile and save the stats to FILE.')
+    parser.add_argument('--seed', action='store', type=int,
+                        help='Seed for the random number generators, for reproducible training. Trainings are only cached with a seed.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the training from the checkpoint of an interrupted run.')
+    parser.add_argument('--checkpoint_dir', action='store', default='.checkpoints',
+                        help='Directory for the checkpoints of solutions that take a checkpoint argument.')
+    parser.add_argument('--checkpoint_interval', action='store', type=float, default=30.0,
+                        help='Seconds between checkpoints.')
+    parser.add_argument('--no_cache', action='store_true',
+                        help='Always train, rather than reuse the result of an identical earlier training.')
+    parser.add_argument('--cache_dir', action='store', default='.training_cache',
+                        help='Directory of the training cache.')
+    parser.add_argument('--cache_size_mb', action='store', type=float, default=512,
+                        help='The least recently used trainings are deleted beyond this size.')
+    parser.add_argument('--verbosity', '-v', action='store', type=int, default=progress.NORMAL,
+                        choices=range(4),
+                        help='0: quiet, 1: status lines every --progress_interval seconds, 2: also every new best candidate, 3: every candidate.')
+    parser.add_argument('--progress_interval', action='store', type=float, default=5.0,
+                        help='Seconds between status lines of a search.')
+    parser.add_argument('--trace', metavar='FILE', action='store',
+                        help='Append the best --top_k candidates of a search to FILE (JSON lines) with every status line.')
+    parser.add_argument('--top_k', action='store', type=int, default=10,
+                        help='Number of candidates in each line of the --trace.')
+
+    args = parser.parse_args()
+
+    if args.list_solvers:
+        print("\n".join(sorted(trialmodule.SOLVERS)))
+        sys.exit(0)
+
+    fname = problem_path(args.problem)
+
+    instrumentation.reset()
+    progress.configure(verbosity=args.verbosity, interval=args.progress_interval, trace=args.trace,
+                       top_k=args.top_k)
+
+    # a converted NAME.problem directory (see problem_store.py) is used if there is one.
+    with instrumentation.timer("load_problem"):
+        problem = load_problem(args.problem)
+
+    print("########## Problem hint: ####################")
+    print(problem["Hint"], end="")
+    if problem["Hint"][-1] != "\n":
+        print()
+    print("########## Now running your code ############")
+
+    if args.print_problem_stats:
+        print(f"number of training samples: {len(problem['TrainSamples'])}")
+        print(f"label bias (sum/number): {sum(problem['TrainLabels']) / len(problem['TrainLabels'])}")
+        print(f"Training ETA: {problem['TimeEst']}")
+
+    if args.cheat:
+        from pprint import pprint
+        pprint(problem)
+
+    if args.solution_function_name is None:
+        print("Please provide the name of your proposed solution function as --fun [NAME] to evaluate. exiting.")
+        sys.exit(0)
+
+    # a preempted batch node sends SIGTERM: stop like on Ctrl-C, so that the solver saves a checkpoint.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    result_dict = evaluate(problem, args.problem, args.solution_function_name, args.sample_limit,
+                           seed=args.seed, chunk_size=args.chunk_size, profile=args.profile,
+                           cache=None if args.no_cache else TrainingCache(args.cache_dir, args.cache_size_mb * 2**20),
+                           checkpoint_dir=args.checkpoint_dir, resume=args.resume,
+                           checkpoint_interval=args.checkpoint_interval)
+    if result_dict is None:
+        sys.exit(0)
+
+    output_filename = save_result(result_dict)
+
+    print(f"Training accuracy: {result_dict['training_accuracy']:.2f}%, taking {result_dict['training_time']:.1f} seconds to train. Test accuracy: {result_dict['test_accuracy']:.2f}%")
+
+    #if dt > problem["TimeEst"]:
+    #    print(f"It took more than {problem['TimeEst']} seconds to train your solution - we are sure there is a better method!")
+
+    print(f"Run on {fname} saved to {output_filename}.\nUpload with:\n\tck store_experiment qml --json_file={output_filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,56 @@
-from .classical_svm import *
-from .continuous_solver import *
-from .discrete_solver import *
-from .manual_solver import *
+"""The example solutions, imported on first use.
+
+Importing the package is quick: a solver module (and Qiskit, scipy or sklearn
+with it) is only imported when one of its names is looked up, e.g.
+
+    import example_solutions
+    example_solutions.get_solver("discrete_solver")(training_data)
+
+SOLVERS lists the training functions without importing anything. Look solvers
+up with get_solver rather than as attributes: once a solver module has been
+imported (from example_solutions.discrete_solver import ...), the package
+attribute of the same name is that module, not the function.
+"""
+import importlib
+import importlib.util
+
+# training function name -> module that defines it.
+SOLVERS = {
+    "classical_svm": "classical_svm",
+    "continuous_solver": "continuous_solver",
+    "discrete_solver": "discrete_solver",
+    "manual_solver": "manual_solver",
+    "observable_solver": "observable_fit",
+    "quantum_kernel_svm": "quantum_kernel",
+}
+
+
+def get_solver(name):
+    """The training function `name`, one of SOLVERS, importing its module."""
+    if name not in SOLVERS:
+        raise ValueError(f"Unknown solver {name!r}, use one of {sorted(SOLVERS)}.")
+    return getattr(importlib.import_module("." + SOLVERS[name], __name__), name)
+
+
+def __getattr__(name):
+    if name in SOLVERS:
+        solver = get_solver(name)
+        # importing the submodule set the package attribute of the same name (e.g.
+        # discrete_solver) to the module: replace it by the function, for later lookups.
+        globals()[name] = solver
+        return solver
+    if importlib.util.find_spec(f"{__name__}.{name}") is not None:
+        # from example_solutions import statevector
+        return importlib.import_module("." + name, __name__)
+
+    # everything else the solver modules define used to be star-imported here.
+    if not name.startswith("_"):
+        for module_name in sorted(set(SOLVERS.values())):
+            module = importlib.import_module("." + module_name, __name__)
+            if hasattr(module, name):
+                return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(SOLVERS))
@@ -0,0 +1,60 @@
+"""Saving the progress of a long training, to continue it after an interruption.
+
+A solver that takes a checkpoint argument saves its state every `interval`
+seconds, and when it is interrupted (KeyboardInterrupt, or SIGTERM under
+evaluate.py):
+
+    if checkpoint is not None and checkpoint.due():
+        checkpoint.save(config, {"num_circuits": ..., "best_cost": ...})
+
+and starts from checkpoint.load(config) if that is not None. config describes
+the training (gates, depth, a fingerprint of the data, ...): a checkpoint of a
+different training is never loaded (see disk_cache.data_fingerprint). Checkpoints are pickled, and written to a
+temporary file that is then renamed, so an interruption while saving leaves
+the previous checkpoint intact.
+"""
+from .disk_cache import replace_file
+import os
+import pickle
+import time
+
+
+class Checkpoint(object):
+
+    def __init__(self, path, interval=30.0, resume=False):
+        """resume: if False, load() ignores any existing checkpoint (which is then overwritten)."""
+        self.path = path
+        self.interval = interval
+        self.resume = resume
+        self._last_save = time.monotonic()
+
+    def load(self, config):
+        """The saved state, or None if there is none for this config."""
+        if not self.resume:
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        if saved["config"] != config:
+            print(f"Ignoring the checkpoint {self.path}, it is for a different training.")
+            return None
+        print(f"Resuming from the checkpoint {self.path} saved at {time.ctime(saved['time'])}.")
+        return saved["state"]
+
+    def due(self):
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, config, state):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        saved = {"config": config, "state": state, "time": time.time()}
+        replace_file(self.path, lambda f: pickle.dump(saved, f))
+        self._last_save = time.monotonic()
+
+    def remove(self):
+        """Deletes the checkpoint, once the training has finished."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,89 @@
+"""Lazy enumeration of distinct circuits built from a set of gates.
+
+Enumerating itertools.permutations of the allowed gates produces the same
+unitary many times over: gates on different qubits can be swapped, self-inverse
+pairs such as H.H cancel, and so on. canonical_circuits instead yields one
+circuit per distinct unitary (up to global phase), using the shortest gate
+sequence and, among those, the first one in gate-list order.
+
+Circuits are generated breadth first. A circuit is pruned as soon as
+ - two neighbouring gates commute and are out of gate-list order, or
+ - its unitary was already produced by an earlier circuit,
+since every extension of such a circuit is equivalent to an extension of the
+earlier one. Gates may be used more than once.
+
+The unitary of every circuit is computed on the way (one matrix product per
+circuit), and with with_unitaries=True it is yielded along with the circuit, so
+that a search does not simulate the circuit again.
+"""
+from .statevector import circuit_unitary
+import hashlib
+import numpy as np
+
+
+def unitary_key(unitary, decimals=8):
+    """A hashable fingerprint of a unitary that ignores the global phase."""
+    flat = unitary.ravel()
+    pivot = flat[np.argmax(np.abs(flat) > 1e-6)]
+    normalised = np.round(flat * (abs(pivot) / pivot), decimals) + (0.0 + 0.0j)  # + 0 turns -0.0 into 0.0
+    return hashlib.blake2b(normalised.tobytes(), digest_size=16).digest()
+
+
+def _commutes(a, b):
+    return np.allclose(a @ b, b @ a)
+
+
+def gate_unitaries(gates, num_qubits):
+    return [circuit_unitary((gate,), num_qubits) for gate in gates]
+
+
+def sequence_unitary(indices, matrices, num_qubits):
+    """The unitary of the circuit of gates[i] for i in indices (matrices from gate_unitaries),
+    multiplied in the same order as canonical_circuits does, so bit for bit the same."""
+    unitary = np.eye(2 ** num_qubits, dtype=complex)
+    for idx in indices:
+        unitary = matrices[idx] @ unitary
+    return unitary
+
+
+def canonical_circuits(gates, max_depth, num_qubits, key=unitary_key, with_unitaries=False):
+    """Yields tuples of gates, one per distinct unitary reachable with at most
+    max_depth gates, shortest circuits first.
+
+    gates: gate application functions (or operation tuples), in order of preference.
+    key: maps a circuit unitary to a hashable value; circuits with equal keys are
+         considered duplicates.
+    with_unitaries: yield (circuit, unitary) pairs instead. The unitaries are read-only.
+    """
+    gates = list(gates)
+    matrices = gate_unitaries(gates, num_qubits)
+    # commute[i][j]: appending gate j straight after gate i can be swapped round.
+    commute = [[_commutes(a, b) for b in matrices] for a in matrices]
+
+    identity = np.eye(2 ** num_qubits, dtype=complex)
+    identity.flags.writeable = False
+    seen = {key(identity)}
+    frontier = [((), None, identity)]
+    yield ((), identity) if with_unitaries else ()
+
+    for _ in range(max_depth):
+        next_frontier = []
+        for circuit, last, unitary in frontier:
+            for idx, gate in enumerate(gates):
+                if last is not None and idx < last and commute[last][idx]:
+                    continue # the swapped order is generated instead.
+
+                new_unitary = matrices[idx] @ unitary
+                new_unitary.flags.writeable = False
+                new_key = key(new_unitary)
+                if new_key in seen:
+                    continue
+                seen.add(new_key)
+
+                new_circuit = circuit + (gate,)
+                next_frontier.append((new_circuit, idx, new_unitary))
+                yield (new_circuit, new_unitary) if with_unitaries else new_circuit
+
+        frontier = next_frontier
+        if not frontier:
+            return
@@ -0,0 +1,64 @@
+"""A depth first search over discrete circuits that shares work between candidates.
+
+prefix_tree_search scores the same circuits as discrete_solver's exhaustive
+search, one per distinct unitary (see circuit_enumeration), but walks them as a
+tree, depth first: every circuit extends its parent by one gate, so the batch of
+training states after a circuit is the parent's batch times that gate's
+unitary. Scoring a circuit then takes one (N x 2**n) by (2**n x 2**n) product,
+instead of building its observable U^dagger Z U first.
+
+The tree is enumerated before any circuit is scored, which does not depend on
+the training set. With a large training set the search is somewhat faster than
+the exhaustive one, but with stop_accuracy the exhaustive search, which
+enumerates lazily and tries the shortest circuits first, usually stops sooner.
+"""
+from .helper_functions import compute_parity_exp_value
+from .circuit_enumeration import canonical_circuits, gate_unitaries
+import numpy as np
+
+
+def accuracy(predictions, labels):
+    """The fraction of predictions with the same sign as the +1/-1 labels."""
+    return np.mean(np.where(predictions > 0, 1, -1) == labels)
+
+
+def _prefixes(gates, vectors, max_depth, num_qubits):
+    """Depth first walk over the circuits of canonical_circuits, up to max_depth gates.
+
+    Yields (circuit, states) pairs, where states are the input vectors after the
+    circuit. Only the states of the circuits on the current path are kept.
+    """
+    matrices = {gate: matrix.T for gate, matrix in zip(gates, gate_unitaries(gates, num_qubits))}
+    children = {}
+    for circuit in canonical_circuits(gates, max_depth, num_qubits):
+        if circuit:
+            children.setdefault(circuit[:-1], []).append(circuit)
+
+    stack = [((), vectors)]
+    while stack:
+        circuit, states = stack.pop()
+        if circuit:
+            # states are the parent's until here.
+            states = states @ matrices[circuit[-1]]
+        yield circuit, states
+        # reversed so that children are popped in enumeration order.
+        stack.extend((child, states) for child in reversed(children.pop(circuit, [])))
+
+
+def prefix_tree_search(gates, vectors, labels, max_depth, num_qubits, stop_accuracy=None):
+    """Finds the circuit of at most max_depth gates with the lowest training cost.
+
+    returns: (best_circuit, best_cost, number of circuits scored)
+    """
+    best_circuit, best_cost, num_scored = None, float('Inf'), 0
+
+    for circuit, states in _prefixes(list(gates), np.asarray(vectors, dtype=complex), max_depth, num_qubits):
+        predictions = compute_parity_exp_value(states)
+        cost = np.sum(np.abs(labels - predictions))
+        num_scored += 1
+        if cost < best_cost:
+            best_circuit, best_cost = circuit, cost
+            if stop_accuracy is not None and accuracy(predictions, labels) >= stop_accuracy:
+                break
+
+    return best_circuit, best_cost, num_scored
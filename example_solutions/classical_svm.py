@@ -1,11 +1,13 @@
 from .helper_functions import inference_retval
-from sklearn import svm
+import functools
 import numpy as np
 
 def classical_svm(training_example_wfns):
     """This is a train function for any circuit ignoring all quantum properties.
     This will work given enough examples, but well be very slow!
     """
+    from sklearn import svm
+
     clf = svm.SVC(gamma='auto', C=8)
     vecs, actual_labels = tuple(zip(*training_example_wfns))
     vecs = np.array(vecs);
@@ -13,15 +15,28 @@ def classical_svm(training_example_wfns):
 
     clf.fit(vecs, actual_labels)
 
-    # now we create the inference function. This should take a state and produce a prediction.
+    return classical_svm_inference(clf)
+
+
+def classical_svm_inference(clf):
+    """The inference_retval for a fitted SVC, also used to rebuild it from the training cache."""
+
+    # now we create the inference functions. These take a state, or a matrix with one
+    # state per row, and produce a prediction for each.
+    def infer_batch(wavefunctions):
+        wavefunctions = np.asarray(wavefunctions)
+        test_vecs = np.concatenate([wavefunctions.real, wavefunctions.imag], axis=1)
+        return clf.predict( test_vecs )
+
     def infer(wavefunction):
         wavefunction = np.array(wavefunction).reshape(1, -1)
-        test_vec = np.concatenate([wavefunction.real, wavefunction.imag], axis=1)
-        test_prediction = clf.predict( test_vec )[0]
+        test_prediction = infer_batch( wavefunction )[0]
 
         return test_prediction
 
 
     return inference_retval(
-        infer_fun = infer
+        infer_fun = infer,
+        infer_batch = infer_batch,
+        artifact = functools.partial(classical_svm_inference, clf)
     )
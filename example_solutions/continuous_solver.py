@@ -1,128 +1,385 @@
-from .helper_functions import compute_parity_exp_value, inference_retval
-from functools import partial
-from scipy.optimize import minimize
+from .helper_functions import inference_retval, split_training_data
+from .parametric import ParametricProgram
+from .gradients import loss_and_gradient, adam
+from .multistart import multistart_optimize
+from .disk_cache import data_fingerprint
+from . import instrumentation
+from . import progress
+from typing import TYPE_CHECKING
+import functools
+import time
 import numpy as np
-from qiskit import QuantumCircuit, QuantumRegister, BasicAer, execute
 
-class HardwareEfficientAnsatzInverse(object):
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit, QuantumRegister
 
 
-    ###############################################################
-    # This circuit has a particular structure that will work well #
-    # for problem 4 but not for problem 5. Use the problem 5 hint # 
-    # to write a new circuit structure.                           #
-    ###############################################################
+class LayeredAnsatzInverse(object):
+    """`depth` layers of an entangler followed by rz, rx, rz on every qubit, then a
+    final entangler followed by rz, rx on every qubit.
 
-    def __init__(self, num_qubits, depth, params):
+    The parameters of the final level come first, then those of each layer, from
+    the one applied last to the one applied first. So the parameters of depth d + 1
+    are those of depth d followed by those of a new first layer.
+
+    With growable=True, every layer is the entangler, rz rx rz, the inverse of the
+    entangler, and rz rx rz again (6 angles per qubit), which is the identity when
+    its angles are 0. A trained circuit then computes exactly the same with a new
+    layer of zero angles in front of it (see grow_parameters).
+    Subclasses define the entangler.
+    """
+
+    def __init__(self, num_qubits, depth, params, growable=False):
 
         self._num_qubits = num_qubits
         self._depth = depth
         self._params = params
+        self._growable = growable
 
-    def apply(self, circ: QuantumCircuit, q_reg: QuantumRegister) -> QuantumCircuit:
+    def entangler(self):
+        """The fixed gates of every layer, as (name, qubits, None) tuples."""
+        raise NotImplementedError
 
-        for iod in range(self._depth):
+    def entangler_inverse(self):
+        """The inverse of the entangler: its gates in reverse order, as they are all
+        self-inverse (cx, ch, cz, swap). Override this for any other entangler."""
+        return self.entangler()[::-1]
 
-            #'Undo' CNOTS
-            for iq in range(self._num_qubits - 1):
-                circ.cx(q_reg[iq % self._num_qubits], q_reg[(iq+1) % self._num_qubits])
+    def _rotations(self, first):
+        return [(name, (iq,), first + 3 * iq + k)
+                for iq in range(self._num_qubits) for k, name in enumerate(("rz", "rx", "rz"))]
 
-            for iq in range(self._num_qubits):
-                circ.rz(self._params[iq * (3 * self._depth + 2) + 3 * iod], q_reg[iq])
-                circ.rx(self._params[iq * (3 * self._depth + 2) + 3 * iod + 1], q_reg[iq])
-                circ.rz(self._params[iq * (3 * self._depth + 2) + 3 * iod + 2], q_reg[iq])
+    def gate_list(self):
+        """The circuit as (name, qubits, param_index) tuples, param_index is None for fixed gates."""
+
+        n = self._num_qubits
+        layer_size = 6 * n if self._growable else 3 * n
+        gates = []
+        for iod in range(self._depth):
+            first = 2 * n + layer_size * (self._depth - 1 - iod)
 
+            gates.extend(self.entangler())
+            gates.extend(self._rotations(first))
+            if self._growable:
+                gates.extend(self.entangler_inverse())
+                gates.extend(self._rotations(first + 3 * n))
 
         # Final level
-        for iq in range(self._num_qubits  - 1):
-            circ.cx(q_reg[iq % self._num_qubits], q_reg[(iq+1) % self._num_qubits])
+        gates.extend(self.entangler())
+        for iq in range(n):
+            gates.append(("rz", (iq,), 2 * iq))
+            gates.append(("rx", (iq,), 2 * iq + 1))
 
-        for iq in range(self._num_qubits):
-            circ.rz(self._params[iq * (3 * self._depth + 2) + 3 * self._depth], q_reg[iq])
-            circ.rx(self._params[iq * (3 * self._depth + 2) + 3 * self._depth + 1], q_reg[iq])
+        return gates
+
+    def apply(self, circ: "QuantumCircuit", q_reg: "QuantumRegister") -> "QuantumCircuit":
+
+        for name, qubits, param_index in self.gate_list():
+            params = [] if param_index is None else [self._params[param_index]]
+            getattr(circ, name)(*params, *[q_reg[q] for q in qubits])
 
         return circ
 
 
-def objective_function(params, num_qubits, depth, data, simulator):
+class HardwareEfficientAnsatzInverse(LayeredAnsatzInverse):
 
-    fun = 0.0
-    for train_vector, train_label in data:
 
-        pred = prediction(params, num_qubits, depth, train_vector, simulator)
-        fun += ((pred - train_label)**2)
+    ###############################################################
+    # This circuit has a particular structure that will work well #
+    # for problem 4 but not for problem 5. Use the problem 5 hint # 
+    # to write a new circuit structure.                           #
+    ###############################################################
 
-    return fun
+    def entangler(self):
+        #'Undo' CNOTS
+        return [("cx", (iq % self._num_qubits, (iq+1) % self._num_qubits), None)
+                for iq in range(self._num_qubits - 1)]
 
 
-def build_circuit(num_qubits, depth, params):
-    inv_circ = HardwareEfficientAnsatzInverse(num_qubits, depth, params)
+class ControlledHadamardAnsatzInverse(LayeredAnsatzInverse):
+    """The structure of the problem 5 hint: a controlled H from the last qubit to the
+    first one (wrapping round), and a rotation on every qubit."""
 
-    qr = QuantumRegister(num_qubits, "qr")
-    circ = QuantumCircuit(qr)
+    def entangler(self):
+        if self._num_qubits < 2:
+            return []
+        return [("ch", (self._num_qubits - 1, 0), None)]
 
-    # build the circuit by appending gates
-    circ = inv_circ.apply(circ, qr)
 
-    return circ
+# continuous_solver's ansatz argument -> circuit structure.
+ANSATZES = {
+    "hardware_efficient": HardwareEfficientAnsatzInverse,
+    "controlled_h": ControlledHadamardAnsatzInverse,
+}
 
 
-def prediction(params, num_qubits, depth, vector, simulator):
+def objective_function(params, program, vectors, labels):
+    instrumentation.count("objective_evaluations")
 
-    circ = build_circuit(num_qubits, depth, params)
+    preds = prediction(params, program, vectors)
+    return np.sum((preds - labels)**2)
 
-    execution_result = execute(circ, simulator, backend_options={"initial_statevector": vector}).result()
-    predicted_label = compute_parity_exp_value(execution_result.get_statevector(circ))
 
-    return predicted_label
+def compile_ansatz(num_qubits, depth, ansatz=HardwareEfficientAnsatzInverse, growable=False):
+    """The ansatz as a ParametricProgram: the circuit structure is built once and
+    new parameters are bound into it without creating any Qiskit objects."""
+    inv_circ = ansatz(num_qubits, depth, params=None, growable=growable)
+    return ParametricProgram(inv_circ.gate_list(), num_qubits)
 
 
-def continuous_solver(training_data):
+def grow_parameters(params, program):
+    """The trained parameters of a growable LayeredAnsatzInverse, extended to the one
+    layer deeper `program` with zero angles: the new layer is the identity."""
+    return np.concatenate([params, np.zeros(program.num_params - len(params))])
 
-    simulator = BasicAer.get_backend('statevector_simulator')
 
+def prediction(params, program, vectors):
+    """Predicts the label of a single statevector, or of each row of a matrix of them."""
 
-    ########################################################
-    # Increasing the depth will allow more circuits to be  #
-    # explored, but will mean there are more parameters to #
-    # invert for.                                          #
-    depth = 0                                              #
-    ########################################################
+    return program.predict(params, vectors)
 
-    num_qubits = int(np.log2(len(training_data[0][0])))
 
-    # Hardware efficient parameter setup
-    num_params = num_qubits*(3*depth + 2)
+def optimize_parameters(program, vectors, labels, init_params, optimizer="L-BFGS-B",
+                        batch_size=None, maxiter=1000, monitor=None, disp=True):
+    """Minimises the training loss of a compiled ansatz starting from init_params.
+
+    monitor: optional function called as monitor(params, loss) after every loss
+             evaluation, e.g. to keep track of the best parameters or to abort.
+    disp: print the optimiser's convergence messages (Nelder-Mead only).
+    returns: a scipy OptimizeResult.
+    """
+    from scipy.optimize import minimize
 
-    obj_fun = partial(objective_function, num_qubits=num_qubits, depth=depth,
-                      data=training_data, simulator=simulator)
+    def obj_fun(params):
+        loss = objective_function(params, program, vectors, labels)
+        if monitor is not None:
+            monitor(params, loss)
+        return loss
 
-    init_params = np.random.uniform(0.0, 2.0*np.pi, size=num_params)
+    def loss_and_grad(params, indices=slice(None)):
+        loss, grad = loss_and_gradient(program, params, vectors[indices], labels[indices])
+        # only full batch losses, not those of Adam's mini-batches.
+        if monitor is not None and (isinstance(indices, slice) or len(indices) == len(labels)):
+            monitor(params, loss)
+        return loss, grad
 
     ###################################################################
     # Look at the documentation for scipy.optimize.minimize.          #
     # There are parameters you can change, which may lead to          #
     # improved results.                                               #
-    res = minimize(fun=obj_fun, x0=init_params, method='Nelder-Mead', #
-                   tol=1e-1, options={'disp':True, 'maxiter':1000})   #
+    if optimizer == "Nelder-Mead":                                    #
+        res = minimize(fun=obj_fun, x0=init_params, method='Nelder-Mead',
+                       tol=1e-1, options={'disp':disp, 'maxiter':maxiter})
+    elif optimizer == "L-BFGS-B":                                     #
+        res = minimize(fun=loss_and_grad, x0=init_params, jac=True, method='L-BFGS-B',
+                       options={'maxiter':maxiter})
+    elif optimizer == "Adam":                                         #
+        res = adam(loss_and_grad, init_params, len(labels), batch_size=batch_size,
+                   maxiter=maxiter)
+    else:                                                             #
+        raise ValueError(f"Unknown optimizer '{optimizer}'.")         #
     ###################################################################
 
-    best_params = res.x
-    best_circ   = build_circuit(num_qubits, depth, best_params)
+    return res
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def adaptive_optimize(vectors, labels, ansatz, depth, max_depth, optimizer="L-BFGS-B", batch_size=None,
+                      maxiter=1000, target_loss=None, time_budget=None, checkpoint=None):
+    """Optimises the ansatz at depth `depth`, then one layer deeper at a time, each
+    depth starting from the optimum of the one before (see grow_parameters).
+
+    Stops after max_depth, once the training loss is at most target_loss, or once
+    time_budget seconds have passed, in the middle of an optimisation if need be.
+    checkpoint: saved after every depth, a resumed search continues one layer deeper.
+    returns: (program, params, loss) of the depth with the lowest training loss.
+    """
+    if max_depth < depth:
+        raise ValueError(f"max_depth ({max_depth}) must be at least the starting depth ({depth}).")
+
+    num_qubits = int(np.log2(vectors.shape[1]))
+    t0 = time.monotonic()
+    config = {"mode": "adaptive", "ansatz": ansatz.__name__, "growable": True, "depth": depth,
+              "optimizer": optimizer, "batch_size": batch_size, "data": data_fingerprint(vectors, labels)}
+
+    params, best, best_depth = None, None, None
+    state = checkpoint.load(config) if checkpoint is not None else None
+    if state is not None:
+        params = state["params"]
+        best_depth = state["best_depth"]
+        best = (compile_ansatz(num_qubits, best_depth, ansatz, growable=True), state["best_params"], state["best_loss"])
+        depth = state["depth"] + 1
+        progress.log(f"Continuing at depth {depth}, best training loss so far {state['best_loss']:.4f}")
+
+    while depth <= max_depth:
+        with instrumentation.timer("circuit_construction"):
+            program = compile_ansatz(num_qubits, depth, ansatz, growable=True)
+        if params is None:
+            init_params = np.random.uniform(0.0, 2.0*np.pi, size=program.num_params)
+        else:
+            init_params = grow_parameters(params, program)
+        current = {"params": init_params, "loss": np.inf}
+
+        def monitor(params, loss):
+            if loss < current["loss"]:
+                current["params"], current["loss"] = np.array(params), loss
+            if time_budget is not None and time.monotonic() - t0 > time_budget:
+                raise _OutOfTime()
+
+        out_of_time = False
+        try:
+            with instrumentation.timer("optimizer"):
+                res = optimize_parameters(program, vectors, labels, init_params, optimizer=optimizer,
+                                          batch_size=batch_size, maxiter=maxiter, monitor=monitor, disp=False)
+            if res.fun <= current["loss"]:
+                current["params"], current["loss"] = res.x, res.fun
+        except _OutOfTime:
+            out_of_time = True
+
+        params, loss = current["params"], current["loss"]
+        progress.log(f"Depth {depth} ({program.num_params} parameters): training loss {loss:.4f}, "
+                     f"{time.monotonic() - t0:.1f}s elapsed")
+        if best is None or loss < best[2]:
+            best, best_depth = (program, params, loss), depth
+        if checkpoint is not None and not out_of_time:
+            checkpoint.save(config, {"depth": depth, "params": params, "loss": loss,
+                                     "best_depth": best_depth, "best_params": best[1], "best_loss": best[2]})
+
+        if out_of_time:
+            progress.log(f"Stopped at depth {depth}, the time budget of {time_budget}s is used up.")
+            break
+        if target_loss is not None and loss <= target_loss:
+            break
+        depth += 1
+
+    return best
+
+
+def continuous_solver(training_data, depth=0, optimizer="L-BFGS-B", batch_size=None, maxiter=1000,
+                      restarts=1, target_loss=None, max_workers=None, checkpoint=None,
+                      ansatz="hardware_efficient", max_depth=None, time_budget=None):
+    """Optimises the rotation angles of an ansatz, HardwareEfficientAnsatzInverse by default.
+
+    ansatz: a name in ANSATZES ("controlled_h" for problem 5), or a LayeredAnsatzInverse subclass.
+    optimizer: "Nelder-Mead" (no gradients), or "L-BFGS-B" / "Adam", which use the
+               exact gradient of the training loss (see gradients.loss_and_gradient).
+    batch_size: with "Adam", the number of training samples per step. All by default.
+    restarts: number of independent optimisations from different random starting
+              points, run in parallel processes (see multistart). The best one wins.
+    target_loss: with restarts, stop all of them once one reaches this training loss.
+    max_workers: with restarts, the number of processes, one per core by default.
+    checkpoint: a checkpoint.Checkpoint to save the best parameters so far to, and to
+                resume from. A resumed optimisation starts again from those parameters.
+                Not used with restarts.
+    max_depth: grow the circuit adaptively, from `depth` up to max_depth layers, until
+               the training loss is at most target_loss (see adaptive_optimize). The
+               layers are then the growable ones of LayeredAnsatzInverse.
+    time_budget: with max_depth, stop growing and optimising after this many seconds.
+    """
+
+
+    ########################################################
+    # Increasing the depth will allow more circuits to be  #
+    # explored, but will mean there are more parameters to #
+    # invert for.                                          #
+    ########################################################
+
+    num_qubits = int(np.log2(len(training_data[0][0])))
+    train_vectors, train_labels = split_training_data(training_data)
+
+    if isinstance(ansatz, str):
+        if ansatz not in ANSATZES:
+            raise ValueError(f"Unknown ansatz '{ansatz}', use one of {sorted(ANSATZES)}.")
+        ansatz = ANSATZES[ansatz]
+
+    if max_depth is not None:
+        if restarts > 1:
+            raise ValueError("The adaptive depth search (max_depth) does not do restarts.")
+        program, best_params, loss = adaptive_optimize(
+            train_vectors, train_labels, ansatz, depth, max_depth, optimizer=optimizer, batch_size=batch_size,
+            maxiter=maxiter, target_loss=target_loss, time_budget=time_budget, checkpoint=checkpoint)
+        progress.log(f"Adaptive search finished with {program.num_params} parameters and training loss {loss:.4f}")
+    elif restarts > 1:
+        configs = [{"seed": seed, "depth": depth, "optimizer": optimizer, "ansatz": ansatz,
+                    "batch_size": batch_size, "maxiter": maxiter} for seed in range(restarts)]
+        with instrumentation.timer("optimizer"):
+            reports = multistart_optimize(train_vectors, train_labels, configs,
+                                          target_loss=target_loss, max_workers=max_workers)
+        for report in reports:
+            progress.log(f"Restart {report['seed']} (depth {report['depth']}, {report['optimizer']}): "
+                         f"training loss {report['loss']:.4f} in {report['time']:.2f}s"
+                         + (" (cancelled)" if report["cancelled"] else ""))
+        best = min(reports, key=lambda report: report["loss"])
+        depth, best_params = best["depth"], best["params"]
+        program = compile_ansatz(num_qubits, depth, ansatz)
+    else:
+        with instrumentation.timer("circuit_construction"):
+            program = compile_ansatz(num_qubits, depth, ansatz)
+        init_params = np.random.uniform(0.0, 2.0*np.pi, size=program.num_params)
+
+        config = {"mode": "fixed", "ansatz": ansatz.__name__, "growable": False, "depth": depth,
+                  "optimizer": optimizer, "batch_size": batch_size,
+                  "data": data_fingerprint(train_vectors, train_labels)}
+        best = {"params": init_params, "loss": np.inf, "evaluations": 0}
+
+        state = checkpoint.load(config) if checkpoint is not None else None
+        if state is not None:
+            best = state
+            init_params = best["params"]
+            progress.log(f"Continuing after {best['evaluations']} loss evaluations, best training loss so far {best['loss']:.4f}")
+
+        def monitor(params, loss):
+            best["evaluations"] += 1
+            if loss < best["loss"]:
+                best["params"], best["loss"] = np.array(params), loss
+            if checkpoint.due():
+                checkpoint.save(config, best)
+
+        try:
+            with instrumentation.timer("optimizer"):
+                res = optimize_parameters(program, train_vectors, train_labels, init_params,
+                                          optimizer=optimizer, batch_size=batch_size, maxiter=maxiter,
+                                          monitor=monitor if checkpoint is not None else None)
+        except BaseException:
+            # e.g. KeyboardInterrupt: keep the best parameters found so far.
+            if checkpoint is not None:
+                checkpoint.save(config, best)
+            raise
+        progress.log(f"Optimisation finished after {res.nit} iterations with training loss {res.fun:.4f}")
+        best_params = res.x if res.fun <= best["loss"] else best["params"]
+
+    return continuous_inference(program.gate_list, num_qubits, best_params)
+
+
+def continuous_inference(gate_list, num_qubits, best_params):
+    """The inference_retval for trained parameters, also used to rebuild it from the training cache."""
+    program     = ParametricProgram(gate_list, num_qubits)
+    best_circ   = program.to_gates(best_params)
 
 
     def infer(vector):
 
-        pred = prediction(best_params, num_qubits, depth, vector, simulator)
+        pred = prediction(best_params, program, vector)
 
         if pred <= 0.0:
             return -1
         else:
             return 1
 
+    def infer_batch(vectors):
+
+        preds = prediction(best_params, program, vectors)
+
+        return np.where(preds <= 0.0, -1, 1)
+
 
     return inference_retval(
             infer_fun = infer,
             infer_circ = best_circ,
-            description = "Circuit generated by continuous search in parameter space"
+            description = "Circuit generated by continuous search in parameter space",
+            infer_batch = infer_batch,
+            artifact = functools.partial(continuous_inference, gate_list, num_qubits, best_params)
         )
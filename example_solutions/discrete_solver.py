@@ -1,9 +1,20 @@
-from .helper_functions import compute_parity_exp_value, inference_retval, print_circuit, gate_repr
-from qiskit import QuantumCircuit, QuantumRegister, BasicAer, execute
+from .helper_functions import inference_retval, print_circuit, split_training_data
+from .statevector import parity_observable, observable_expectation, unitary_observable
+from .circuit_enumeration import canonical_circuits
+from .circuit_search import prefix_tree_search, accuracy
+from .stabilizer import clifford_search, pauli_expectation
+from .parallel_search import parallel_exhaustive_search
+from .sample_selection import compressed_search
+from .gates import Gate
+from .disk_cache import data_fingerprint
+from . import instrumentation
+from . import progress
+import functools
 import itertools
 import numpy as np
 
-def discrete_solver(training_data):
+def discrete_solver(training_data, gates=("h", "x"), max_depth=None, search="exhaustive",
+                    stop_accuracy=None, parallel=False, max_workers=None, checkpoint=None):
     """The example training function for the users.
     This is for the discrete problems (staring with D), continuous problems
     have a different train function.
@@ -11,6 +22,23 @@ def discrete_solver(training_data):
     Lots of opportunities exist for speeding this up. We have used this function internally
     to annotate all problems with the expected training time and will report if you beat that
     or not!
+
+    gates: names of the gates to search over. Single qubit gates (e.g. "h", "x", "y",
+           "s", "t") are tried on every qubit, "cx" on every pair of neighbouring qubits.
+    max_depth: the largest number of gates in a circuit, 2 * num_qubits by default.
+    search: "exhaustive" scores every distinct circuit separately, shortest first.
+            "prefix_tree" scores the same circuits depth first, each from the training
+            states of its parent (see circuit_search). "stabilizer" only works
+            for Clifford gates and scores each distinct Pauli observable U^dagger Z U
+            once, without any 2**n x 2**n matrices (see stabilizer). "compressed" finds
+            the same circuit as "exhaustive" while scoring most candidates on a few
+            training samples only (see sample_selection), stop_accuracy is ignored.
+    stop_accuracy: stop searching once a circuit gets at least this fraction of the
+                   training labels right, e.g. 1.0.
+    parallel: with the exhaustive search, score the circuits in max_workers processes
+              (one per core by default). The result is the same as without.
+    checkpoint: a checkpoint.Checkpoint to save the progress of the (serial) exhaustive
+                search to, and to resume it from.
     """
 
     num_qubits = int(np.log2(len(training_data[0][0]))) # the wavefunction has 2**NQ elements.
@@ -18,91 +46,151 @@ def discrete_solver(training_data):
     # This list does not contain every gate - you may need to extend it.
     # Here a "gate" is a function that takes the circuit and qreg (created later)
     # We need this as gates are methods on the circuits rather than independent objects in Qiskit.
-    # FORMAT: lambda qiskit gate specification, string description of gate/qubit
+    # Gate(name, qubits) is such a function, e.g. Gate("h", (i,))(circ, qreg) calls circ.h(qreg[i]),
+    # and unlike a lambda it can be sent to other processes.
     allowable_gates = []
     for i in range(num_qubits):
-        allowable_gates.extend([
-            lambda circ, qreg, i=i: circ.h(qreg[i]),
-            lambda circ, qreg, i=i: circ.x(qreg[i]),
-        ])
+        allowable_gates.extend([Gate(name, (i,)) for name in gates if name != "cx"])
 
         # Not needed for problem 1, but you will need to include this for problem 2.
-        #if num_qubits>1:
-        #    allowable_gates.append(
-        #        lambda circ, qreg, i=i: circ.cx(qreg[i], qreg[(i+1) % num_qubits]),
-        #    )
-    print('-' * 80)
-    print("Allowable gates:")
-    for current_gate in allowable_gates:
-        q = QuantumRegister(num_qubits, "q")
-        c = QuantumCircuit(q)
-        current_gate(c, q)
-        print(print_circuit(c,num_qubits))
-    print('-' * 80)
-
-    max_depth = num_qubits * 2 # the total number of gates to consider
-    print(f"Maximum gate depth {max_depth}")
-
-    # NOTE: some gates are not affected by ordering!
-    # for example, 2 gates on 2 different qubits can be exchanged.
-    # this is not considered here.
-    possible_circuits = itertools.chain(*[
-                        itertools.permutations((gates for gates in allowable_gates), r=NG)
-                        for NG in range(max_depth+1)
-                       ])
-
-    possible_circuits = list(possible_circuits)
-    print(f"Number of possible circuits to consider: {len(possible_circuits)}")
-
-    simulator = BasicAer.get_backend('statevector_simulator')
-    best_cost = float('Inf')
-    best_circuit = None
-    best_circ    = None
+        if "cx" in gates and num_qubits>1:
+            allowable_gates.append(Gate("cx", (i, (i+1) % num_qubits)))
+    if progress.enabled(progress.VERBOSE):
+        print('-' * 80)
+        print("Allowable gates:")
+        for current_gate in allowable_gates:
+            print(print_circuit((current_gate,), num_qubits))
+        print('-' * 80)
+    else:
+        progress.log(lambda: f"Allowable gates: {', '.join(map(str, allowable_gates))}")
+
+    if max_depth is None:
+        max_depth = num_qubits * 2 # the total number of gates to consider
+    progress.log(f"Maximum gate depth {max_depth}")
+
+    train_vectors, train_labels = split_training_data(training_data)
+
+    with instrumentation.timer("search"):
+        if search == "stabilizer":
+            best_circuit, best_cost, num_circuits, best_pauli = clifford_search(
+                allowable_gates, train_vectors, train_labels, max_depth, num_qubits, stop_accuracy)
+        elif search == "prefix_tree":
+            best_circuit, best_cost, num_circuits = prefix_tree_search(
+                allowable_gates, train_vectors, train_labels, max_depth, num_qubits, stop_accuracy)
+        elif search == "compressed":
+            best_circuit, best_cost, num_circuits = compressed_search(
+                allowable_gates, train_vectors, train_labels, max_depth, num_qubits)
+        elif search == "exhaustive" and parallel:
+            best_circuit, best_cost, num_circuits = parallel_exhaustive_search(
+                allowable_gates, train_vectors, train_labels, max_depth, num_qubits, stop_accuracy,
+                max_workers=max_workers)
+        elif search == "exhaustive":
+            best_circuit, best_cost, num_circuits = _exhaustive_search(
+                allowable_gates, train_vectors, train_labels, max_depth, num_qubits, stop_accuracy,
+                checkpoint)
+        else:
+            raise ValueError(f"Unknown search '{search}'.")
+    instrumentation.count("candidates_scored", num_circuits)
 
-    for current_circuit in possible_circuits:
+    progress.log(f"Done, considered {num_circuits} circuits.")
+    progress.log("Best circuit:")
+    progress.log(lambda: print_circuit(best_circuit, num_qubits))
+    progress.log(f"with training_error {best_cost}")
 
-        ## Building a Qiskit circuit from our internal representation:
-        #
-        qr = QuantumRegister(num_qubits, "qr")
-        circ = QuantumCircuit(qr)
-        if len(current_circuit) == 0:
-            circ.iden(qr)
-        else:
-            for gate_application_function in current_circuit:
-                gate_application_function(circ, qr)
-
-        ## Assessing performance on the training set:
-        #
-        current_cost = 0.0
-        for train_vector, train_label in training_data:
-            execution_result = execute(circ, simulator, backend_options={"initial_statevector": train_vector}).result()
-            predicted_label = compute_parity_exp_value(execution_result.get_statevector(circ))
-            current_cost += abs(train_label - predicted_label)
-        print(f"For circuit {' -> '.join(gate_repr(g) for g in current_circuit)}, training error was {current_cost:.2f}.")
-
-        if current_cost < best_cost:
-            best_circuit    = current_circuit
-            best_circ       = circ
-            best_cost       = current_cost
-        # if best_cost == 0.0:
-        #     break # done!
-
-    print("Done")
-    print("Best circuit:")
-    print(print_circuit(best_circuit, num_qubits))
-    print(f"with training_error {best_cost}")
-
-
-    ## The inference function takes a state and predicts a label:
+
+    return discrete_inference(best_circuit, num_qubits, best_pauli if search == "stabilizer" else None)
+
+
+def discrete_inference(best_circuit, num_qubits, best_pauli=None):
+    """The inference_retval for a trained circuit, also used to rebuild it from the training cache.
+
+    best_pauli: the parity observable of the circuit as a stabilizer Pauli string, if known.
+    """
+
+    ## The inference function takes a state (or a matrix of states) and predicts a label:
     #
-    def infer(input_vector):
-        execution_result = execute(best_circ, simulator, backend_options={"initial_statevector": input_vector}).result()
-        predicted_label = compute_parity_exp_value(execution_result.get_statevector(best_circ))
-        return predicted_label
+    if best_pauli is not None:
+        def infer(input_vector):
+            return pauli_expectation(best_pauli, input_vector)
+    else:
+        best_observable = parity_observable(best_circuit, num_qubits)
+
+        def infer(input_vector):
+            predicted_label = observable_expectation(best_observable, input_vector)
+            return predicted_label
 
 
     return inference_retval(
             infer_fun = infer,
             infer_circ = best_circuit,
-            description = "Circuit generated by exhaustive search."
+            description = "Circuit generated by exhaustive search.",
+            infer_batch = infer,
+            artifact = functools.partial(discrete_inference, best_circuit, num_qubits, best_pauli)
         )
+
+
+def _exhaustive_search(allowable_gates, train_vectors, train_labels, max_depth, num_qubits, stop_accuracy,
+                       checkpoint=None):
+
+    # Some gates are not affected by ordering! For example, 2 gates on 2 different
+    # qubits can be exchanged, and H.H does nothing at all. The enumeration only
+    # yields one circuit for every distinct unitary, lazily, shortest first.
+    possible_circuits = canonical_circuits(allowable_gates, max_depth, num_qubits, with_unitaries=True)
+    num_circuits = 0
+    best_cost = float('Inf')
+    best_circuit = None
+
+    # The enumeration order is fixed, so the position in it is just the number of
+    # circuits scored so far. The best circuit is saved as indices into allowable_gates.
+    config = {"search": "exhaustive", "gates": tuple(allowable_gates), "max_depth": max_depth,
+              "stop_accuracy": stop_accuracy, "data": data_fingerprint(train_vectors, train_labels)}
+    position = {gate: idx for idx, gate in enumerate(allowable_gates)}
+
+    def save_checkpoint():
+        checkpoint.save(config, {"num_circuits": num_circuits, "best_cost": best_cost,
+                                 "best_circuit": None if best_circuit is None
+                                                 else tuple(position[g] for g in best_circuit)})
+
+    state = checkpoint.load(config) if checkpoint is not None else None
+    if state is not None:
+        # the circuits before the saved position are still enumerated, but not scored.
+        for _ in itertools.islice(possible_circuits, state["num_circuits"]):
+            pass
+        num_circuits, best_cost = state["num_circuits"], state["best_cost"]
+        if state["best_circuit"] is not None:
+            best_circuit = tuple(allowable_gates[idx] for idx in state["best_circuit"])
+        progress.log(f"Skipped the {num_circuits} circuits considered before, best training error so far {best_cost:.2f}.")
+
+    # counts the circuits scored in this run, but starts from the best one so far.
+    tracker = progress.Progress("exhaustive search")
+    tracker.best, tracker.best_cost = best_circuit, best_cost
+    try:
+        for current_circuit, unitary in possible_circuits:
+            if checkpoint is not None and checkpoint.due():
+                save_checkpoint()
+
+            ## Assessing performance on the training set, all training vectors at once.
+            ## The enumeration already computed the circuit's unitary U, which turns into
+            ## its parity observable U^dagger Z U, so the whole batch is scored with a
+            ## single matrix product:
+            #
+            observable = unitary_observable(unitary, num_qubits)
+            predicted_labels = observable_expectation(observable, train_vectors)
+            current_cost = np.sum(np.abs(train_labels - predicted_labels))
+            tracker.update(current_circuit, current_cost)
+            num_circuits += 1
+
+            if current_cost < best_cost:
+                best_circuit    = current_circuit
+                best_cost       = current_cost
+                if stop_accuracy is not None and accuracy(predicted_labels, train_labels) >= stop_accuracy:
+                    break # done!
+    except BaseException:
+        # e.g. KeyboardInterrupt: keep the progress up to the last circuit scored.
+        if checkpoint is not None:
+            save_checkpoint()
+        raise
+    finally:
+        tracker.close()
+
+    return best_circuit, best_cost, num_circuits
@@ -0,0 +1,56 @@
+"""Helpers shared by the on-disk caches (training_cache.py, the Gram matrices of
+quantum_kernel) and the checkpoints.
+
+Files are written next to their final name and renamed (replace_file), so a
+reader never sees half a file. A cache directory is kept below a size bound by
+deleting the files that were least recently written or touched with os.utime
+(evict). Cached results are looked up by a hash of the training data they were
+computed from (hash_data, data_fingerprint).
+"""
+import hashlib
+import os
+import numpy as np
+
+
+def hash_data(digest, vectors, labels):
+    """Feeds the training vectors and labels into a hashlib digest."""
+    for array in (np.asarray(vectors, dtype=complex), np.asarray(labels, dtype=float)):
+        digest.update(repr(array.shape).encode())
+        digest.update(np.ascontiguousarray(array).tobytes())
+
+
+def data_fingerprint(vectors, labels):
+    """A short hash of the training data, e.g. for the config of a checkpoint."""
+    digest = hashlib.blake2b(digest_size=16)
+    hash_data(digest, vectors, labels)
+    return digest.hexdigest()
+
+
+def replace_file(path, write):
+    """Creates or replaces the file path with what write(f) writes to a binary file."""
+    tmp_path = path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def evict(directory, suffix, max_bytes):
+    """Deletes the least recently used files ending in suffix until those left
+    in the directory add up to at most max_bytes."""
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(suffix):
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except FileNotFoundError: # evicted by another process.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,109 @@
+"""A picklable representation of a gate application, and circuits made of them.
+
+The solvers describe gates as functions that apply them to a Qiskit circuit,
+e.g. lambda circ, qreg: circ.h(qreg[0]). Lambdas cannot be sent to worker
+processes, and the only way to find out what one does is to run it, so Gate
+stores the same information as plain data while still being callable in the
+same way. A circuit is a tuple of Gates: hashable, cheap to print, and it can
+be drawn without Qiskit (draw_circuit). For sending many circuits to another
+process, pack_circuits turns them into one small integer array.
+"""
+from .statevector import gate_matrix, circuit_operations
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+
+
+class Gate(namedtuple("Gate", ["name", "qubits", "params"])):
+    """A gate `name` with angles `params` applied to the qubit indices `qubits`.
+
+    Gate("cx", (0, 1))(circ, qreg) does the same as circ.cx(qreg[0], qreg[1]).
+    Being a (name, qubits, params) tuple, it is also an operation tuple as used
+    by the statevector simulator.
+    """
+    __slots__ = ()
+
+    def __new__(cls, name, qubits, params=()):
+        return super().__new__(cls, name, tuple(qubits), tuple(params))
+
+    def __call__(self, circ, qreg):
+        return getattr(circ, self.name)(*self.params, *[qreg[q] for q in self.qubits])
+
+    def __str__(self):
+        arg_str = "(" + ", ".join(f"{p:g}" for p in self.params) + ")" if self.params else ""
+        return f"{self.name}{arg_str}[{', '.join(map(str, self.qubits))}]"
+
+    @property
+    def matrix(self):
+        """The unitary on the gate's own qubits (the first listed one most significant),
+        computed once per distinct gate. Read-only."""
+        return _matrix(self.name, self.params)
+
+
+@lru_cache(maxsize=4096)
+def _matrix(name, params):
+    matrix = np.array(gate_matrix(name, params))
+    matrix.flags.writeable = False
+    return matrix
+
+
+def circuit_from_qiskit(circuit):
+    """The gates of a Qiskit circuit as a tuple of Gates."""
+    return tuple(Gate(*operation) for operation in circuit_operations(circuit, None))
+
+
+def circuit_to_qiskit(circuit, num_qubits):
+    """A Qiskit circuit applying the Gates (or gate application functions) of `circuit`."""
+    from qiskit import QuantumCircuit, QuantumRegister
+
+    qr = QuantumRegister(num_qubits, "qr")
+    circ = QuantumCircuit(qr)
+    for gate in circuit:
+        gate(circ, qr)
+    return circ
+
+
+def pack_circuits(circuits, gates):
+    """Circuits as a (len(circuits) x longest circuit) int16 array of indices into
+    the gate list, padded with -1."""
+    position = {gate: idx for idx, gate in enumerate(gates)}
+    packed = np.full((len(circuits), max(map(len, circuits), default=0)), -1, dtype=np.int16)
+    for row, circuit in enumerate(circuits):
+        packed[row, :len(circuit)] = [position[gate] for gate in circuit]
+    return packed
+
+
+def unpack_circuit(row, gates):
+    return tuple(gates[idx] for idx in row if idx >= 0)
+
+
+# how draw_circuit shows the qubits of two qubit gates, (first qubit, second qubit).
+_TWO_QUBIT_SYMBOLS = {
+    "cx": ("■", "X"),
+    "cy": ("■", "Y"),
+    "cz": ("■", "■"),
+    "ch": ("■", "H"),
+    "swap": ("X", "X"),
+}
+
+
+def draw_circuit(circuit, num_qubits):
+    """A text drawing of a sequence of gates (or operation tuples), one wire per qubit
+    and one column per gate, without building a Qiskit circuit."""
+    wires = [[f"q_{q}: ─"] for q in range(num_qubits)]
+    for name, qubits, params in circuit_operations(circuit, num_qubits):
+        if len(qubits) == 2 and name in _TWO_QUBIT_SYMBOLS:
+            symbols = dict(zip(qubits, _TWO_QUBIT_SYMBOLS[name]))
+        else:
+            label = name.upper() + ("(" + ", ".join(f"{p:.3g}" for p in params) + ")" if params else "")
+            symbols = {q: label for q in qubits}
+        width = max(len(symbol) for symbol in symbols.values())
+        low, high = min(qubits), max(qubits)
+        for q, wire in enumerate(wires):
+            if q in symbols:
+                wire.append(symbols[q].center(width, "─"))
+            elif low < q < high:
+                wire.append("┼".center(width, "─"))
+            else:
+                wire.append("─" * width)
+    return "\n".join("─".join(wire) + "─" for wire in wires)
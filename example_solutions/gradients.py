@@ -0,0 +1,99 @@
+"""Exact gradients of the training loss of parametrised circuits.
+
+A parametrised circuit is given as a parametric.ParametricProgram. The loss is
+the squared error sum_n (<phi_n|Z...Z|phi_n> - label_n)**2 over the training
+batch, as in continuous_solver.objective_function.
+
+The gradient is computed by adjoint differentiation: one forward pass over the
+batch of statevectors, then one backward pass that un-computes each gate and
+picks up d(loss)/d(theta) for every rotation on the way. This costs about three
+circuit simulations, whatever the number of parameters.
+"""
+from .helper_functions import compute_parity_exp_value, parity_signs
+from .statevector import apply_gate, FIXED_GATES
+from . import instrumentation
+import numpy as np
+
+# Rotations are exp(-i theta P / 2), so d/dtheta R(theta) = -i/2 P R(theta).
+ROTATION_GENERATORS = {
+    "rx": FIXED_GATES["x"],
+    "ry": FIXED_GATES["y"],
+    "rz": FIXED_GATES["z"],
+}
+
+
+def loss_and_gradient(program, params, vectors, labels):
+    """The squared error loss over the batch and its gradient with respect to params.
+
+    vectors: (N x 2**n) matrix of input statevectors.
+    labels: the N labels.
+    returns: (loss, gradient), gradient has the same shape as params.
+    """
+    instrumentation.count("gradient_evaluations")
+    params = np.asarray(params, dtype=float)
+    gate_list, num_qubits = program.gate_list, program.num_qubits
+    matrices = program.bind(params)
+
+    states = np.asarray(vectors, dtype=complex)
+    for (name, qubits, param_index), matrix in zip(gate_list, matrices):
+        states = apply_gate(states, matrix, qubits, num_qubits)
+
+    residuals = compute_parity_exp_value(states) - labels
+    loss = np.sum(residuals ** 2)
+
+    # d(loss)/d<phi_n| = 2 residual_n Z...Z |phi_n>, carried backwards through the circuit.
+    adjoint = 2 * residuals[:, None] * parity_signs(num_qubits)[None, :] * states
+    gradient = np.zeros_like(params)
+
+    for (name, qubits, param_index), matrix in reversed(list(zip(gate_list, matrices))):
+        if param_index is not None:
+            # states is the state after this gate: d phi = -i/2 P phi.
+            generated = apply_gate(states, ROTATION_GENERATORS[name], qubits, num_qubits)
+            overlap = np.sum(adjoint.conj() * generated)
+            gradient[param_index] += 2 * (-0.5j * overlap).real
+
+        inverse = matrix.conj().T
+        states = apply_gate(states, inverse, qubits, num_qubits)
+        adjoint = apply_gate(adjoint, inverse, qubits, num_qubits)
+
+    return loss, gradient
+
+
+def adam(fun, x0, num_samples, batch_size=None, learning_rate=0.1, maxiter=1000, tol=1e-6,
+         beta1=0.9, beta2=0.999, epsilon=1e-8, seed=None):
+    """Minimises fun with the Adam optimiser, optionally on random mini-batches.
+
+    fun: called as fun(params, indices) with the indices of the training samples
+         in the batch, and returns (loss, gradient).
+    batch_size: number of samples per step, all of them if None.
+    tol: stop once a full-batch step changes the loss by less than this.
+    returns: a scipy OptimizeResult with the final parameters in .x
+    """
+    from scipy.optimize import OptimizeResult
+
+    rng = np.random.RandomState(seed)
+    params = np.array(x0, dtype=float)
+    first_moment = np.zeros_like(params)
+    second_moment = np.zeros_like(params)
+    all_samples = np.arange(num_samples)
+    previous_loss = np.inf
+
+    for iteration in range(1, maxiter + 1):
+        if batch_size is None or batch_size >= num_samples:
+            indices = all_samples
+        else:
+            indices = rng.choice(num_samples, size=batch_size, replace=False)
+
+        loss, gradient = fun(params, indices)
+        first_moment = beta1 * first_moment + (1 - beta1) * gradient
+        second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+        step = first_moment / (1 - beta1 ** iteration)
+        scale = np.sqrt(second_moment / (1 - beta2 ** iteration)) + epsilon
+        params -= learning_rate * step / scale
+
+        if indices is all_samples and abs(previous_loss - loss) < tol:
+            break
+        previous_loss = loss
+
+    loss, gradient = fun(params, all_samples)
+    return OptimizeResult(x=params, fun=loss, jac=gradient, nit=iteration, success=True)
@@ -1,4 +1,6 @@
-from qiskit import QuantumCircuit, QuantumRegister, BasicAer, execute
+from functools import lru_cache
+import functools
+import numpy as np
 import dis
 
 def parity_of(int_type):
@@ -8,92 +10,96 @@ def parity_of(int_type):
         int_type = int_type & (int_type - 1)
     return parity
 
+@lru_cache(maxsize=None)
+def parity_signs(num_qubits):
+    """The +1/-1 parity of every basis state index, i.e. the diagonal of Z x ... x Z."""
+    indices = np.arange(2 ** num_qubits)
+    ones = np.zeros_like(indices)
+    for bit in range(num_qubits):
+        ones += (indices >> bit) & 1
+    signs = 1.0 - 2.0 * (ones & 1)
+    signs.flags.writeable = False
+    return signs
+
 def compute_parity_exp_value(state_vector):
-    exp = 0.0
-    for idx, coeff in enumerate(state_vector):
-        exp += coeff * coeff.conj() * (1 if parity_of(idx) == 0 else -1)
+    """Expectation value of the parity Z x ... x Z, as a real number.
+
+    state_vector: a single statevector, or a (N x 2**n) matrix with one
+    statevector per row, in which case an array of N values is returned.
+    """
+    state_vector = np.asarray(state_vector)
+    probabilities = state_vector.real ** 2 + state_vector.imag ** 2
+    exp = probabilities @ parity_signs(int(np.log2(state_vector.shape[-1])))
 
     # exp = 1 if exp > 0 else -1 # clip to the labels. this may be not what you want for cont. optimisation.
     return exp
 
-def generic_infer(best_circuit, wavefunction):
-
-    simulator = BasicAer.get_backend('statevector_simulator')
-    qr = QuantumRegister(num_qubits, "qr")
-    circ = QuantumCircuit(qr)
+def split_training_data(training_data):
+    """Turns a list of (statevector, label) pairs into a (N x 2**n) complex
+    matrix of statevectors and a vector of labels."""
+    vectors, labels = zip(*training_data)
+    return np.array(vectors, dtype=complex), np.array(labels, dtype=float)
 
-    for gate in best_circuit:
-        gate(circ, qr)
+def generic_infer(best_circuit, wavefunction):
+    """Parity expectation value after best_circuit (a tuple of gates or a Qiskit circuit),
+    for a single statevector or for each row of a matrix of them."""
+    # imported here as the simulator module uses parity_signs from this one.
+    from .statevector import simulate
 
-    opts = {"initial_statevector": wavefunction}
-    result = execute(circ, simulator, backend_options=opts).result()
-    result = compute_parity_exp_value(result.get_statevector(circ))
+    wavefunction = np.asarray(wavefunction, dtype=complex)
+    num_qubits = int(np.log2(wavefunction.shape[-1]))
+    result = compute_parity_exp_value(simulate(best_circuit, wavefunction, num_qubits))
 
     return result
 
 # alternative: defaultdict and .update() - but this is less self documenting.
-def inference_retval(infer_fun = None, infer_circ = None, description = None):
+# infer_batch takes a (N x 2**n) matrix of statevectors and returns N predictions,
+# which is a lot faster than calling infer_fun N times.
+# artifact is what training produced, as a picklable function without arguments
+# that returns this dict again, e.g. functools.partial(some_module_level_function, params).
+# evaluate.py stores it in the training cache and calls it instead of training again.
+def inference_retval(infer_fun = None, infer_circ = None, description = None, infer_batch = None,
+                     artifact = None):
     if infer_circ is not None and infer_fun is None:
         infer_fun = functools.partial(generic_infer, infer_circ)
+        if infer_batch is None:
+            infer_batch = infer_fun
 
-    return {"infer_fun":infer_fun, "infer_circ":infer_circ, "description":description}
-
-class Mock(object):
-
-    def __init__(self, calllist=None, path=None):
-        self.calls = calllist if calllist is not None else []
-        self.priors = path if path is not None else []
-
-    def __getattr__(self, name):
-        #print(self.priors, ("getattr", name))
+    return {"infer_fun":infer_fun, "infer_circ":infer_circ, "description":description,
+            "infer_batch":infer_batch, "artifact":artifact}
 
-        self.calls.append(self.priors + [("getattr", name)])
-        return Mock(self.calls, self.priors+[("getattr", name)])
-
-    def __getitem__(self, slice):
-        #print(self.priors, ("getitem", slice))
-
-        self.calls.append(self.priors + [("getitem", slice)])
-        return Mock(self.calls, self.priors+[("getitem", slice)])
-
-    def __call__(self, *args, **kwargs):
-        #print(self.priors, ("call", args, kwargs))
+def gate_repr(f):
+    """The string repr of a gate, e.g. "cx[0, 1]" or "rz(0.5)[2]".
 
-        self.calls.append(self.priors + [("call", args, kwargs)])
-        return Mock(self.calls, self.priors+[("call", args, kwargs)])
+    f: a Gate, an operation tuple, or a gate application function applying a
+       single gate (e.g. lambda circ, qreg: circ.h(qreg[0])), which is recorded
+       rather than run on a Qiskit circuit.
+    """
+    # imported here as the gates module uses the simulator, which uses this one.
+    from .gates import Gate
+    from .statevector import circuit_operations
 
+    if not isinstance(f, tuple):
+        try:
+            operations = circuit_operations((f,), None)
+        except TypeError:
+            return "? unbound qubit indices"
+        return " -> ".join(str(Gate(*operation)) for operation in operations)
+    return str(Gate(*f))
 
 
-def gate_repr(f):
-    """Extracts a qiskit gate application from a lambda function.
+def print_circuit(current_circuit, num_qubits):
+    """A text drawing of a Qiskit circuit, or of a tuple of gates.
 
-    returns: string repr of the gate.
+    Tuples of Gates (or of operation tuples) are drawn without Qiskit.
     """
-    circ = Mock()
-    qreg = Mock()
-    try:
-        f(circ, qreg)
-    except TypeError:
-        # if there are global var lookups in f, we try to directly eval
-        # it... does not work. so we need the qubit indices to be bound
-        return "? unbound qubit indices"
-    # print(circ.calls)
-    # print(qreg.calls)
-    # just works for a single gate.
-    gate = circ.calls[-1][0][1] # indexes get the deepest call, root, name.
-    # gate_args = [[a for a in args if type(a) != Mock]
-    #              for name, args, kwargs in circ.calls[-1][-1]]
-    g_name, g_args, g_kwargs = circ.calls[-1][-1]
-    g_args = [a for a in g_args if type(a) != Mock]
-    qubit_indices = [idxop[0][1] for idxop in qreg.calls]
-
-    #return gate, g_args, qubit_indices
-    arg_str = "(" + ", ".join(g_args) + ")" if g_args else ""
-    idx_str = ", ".join(map(str, qubit_indices))
-    return f"{gate}{arg_str}[{idx_str}]"
+    from .gates import draw_circuit
 
+    if isinstance(current_circuit, tuple) and all(isinstance(gate, tuple) for gate in current_circuit):
+        return draw_circuit(current_circuit, num_qubits)
 
-def print_circuit(current_circuit, num_qubits):
+    # imported here, so that the package can be used (and imported quickly) without Qiskit.
+    from qiskit import QuantumCircuit, QuantumRegister
 
     if isinstance(current_circuit, tuple):
         qr = QuantumRegister(num_qubits, "qr")
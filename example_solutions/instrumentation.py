@@ -0,0 +1,72 @@
+"""Where did the time go? Named timers, call counters and peak memory.
+
+The solvers and helpers report into module level tallies:
+
+    with instrumentation.timer("optimizer"):
+        ...
+    instrumentation.count("simulator_runs")
+
+and evaluate.py resets them before a run and stores report() in the result
+JSON. Timers with the same name add up, and so do counters.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import cProfile
+import resource
+import sys
+import time
+
+_timers = defaultdict(float)
+_counters = defaultdict(int)
+
+
+def reset():
+    _timers.clear()
+    _counters.clear()
+
+
+@contextmanager
+def timer(name):
+    """Adds the wall clock time spent in the with block to the timer `name`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timers[name] += time.perf_counter() - t0
+
+
+def count(name, n=1):
+    _counters[name] += n
+
+
+def peak_rss_mb():
+    """The peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def report():
+    return {
+        "timers": dict(_timers),
+        "counters": dict(_counters),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+@contextmanager
+def profiled(path=None):
+    """Runs the with block under cProfile and dumps the stats to path (if not None).
+
+    Look at the dump with e.g. python -m pstats PATH, or snakeviz.
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,109 @@
+"""Several continuous optimisations from different starting points, in parallel.
+
+A single random starting point often lands the optimiser in the wrong basin.
+multistart_optimize runs K independent optimisations (each with its own seed,
+depth, optimiser, ...) in a process pool with one worker per core. The training
+batch is put into shared memory once, and every worker maps it rather than
+receiving a pickled copy with each task. As soon as one optimisation reaches
+target_loss, the others are told to stop and report their best point so far.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import multiprocessing
+import os
+import time
+import numpy as np
+
+# Set in each worker process by _init_worker.
+_worker_state = {}
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _init_worker(shm_name, vectors_shape, labels_shape, stop_event):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    vectors = np.ndarray(vectors_shape, dtype=complex, buffer=shm.buf)
+    labels = np.ndarray(labels_shape, dtype=float, buffer=shm.buf, offset=vectors.nbytes)
+    _worker_state.update(shm=shm, vectors=vectors, labels=labels, stop_event=stop_event)
+
+
+def _run_restart(config, target_loss):
+    # imported here as continuous_solver itself imports this module.
+    from .continuous_solver import compile_ansatz, optimize_parameters, HardwareEfficientAnsatzInverse
+
+    vectors, labels = _worker_state["vectors"], _worker_state["labels"]
+    stop_event = _worker_state["stop_event"]
+    num_qubits = int(np.log2(vectors.shape[1]))
+    program = compile_ansatz(num_qubits, config["depth"], config.get("ansatz", HardwareEfficientAnsatzInverse))
+    rng = np.random.RandomState(config["seed"])
+    init_params = rng.uniform(0.0, 2.0 * np.pi, size=program.num_params)
+
+    best = {"loss": np.inf, "params": init_params}
+
+    def monitor(params, loss):
+        if loss < best["loss"]:
+            best["loss"], best["params"] = loss, np.array(params)
+        if target_loss is not None and loss <= target_loss:
+            raise _Cancelled() # we are done, and so is everybody else.
+        if stop_event.is_set():
+            raise _Cancelled()
+
+    t0 = time.time()
+    cancelled = False
+    try:
+        res = optimize_parameters(program, vectors, labels, init_params,
+                                  optimizer=config.get("optimizer", "L-BFGS-B"),
+                                  batch_size=config.get("batch_size"),
+                                  maxiter=config.get("maxiter", 1000),
+                                  monitor=monitor, disp=False)
+        if res.fun < best["loss"]:
+            best["loss"], best["params"] = res.fun, res.x
+    except _Cancelled:
+        cancelled = not (target_loss is not None and best["loss"] <= target_loss)
+
+    report = dict(config)
+    report.update(loss=float(best["loss"]), params=best["params"],
+                  time=time.time() - t0, cancelled=cancelled)
+    return report
+
+
+def multistart_optimize(vectors, labels, configs, target_loss=None, max_workers=None):
+    """Runs one optimisation per config in a process pool.
+
+    configs: dicts with "seed" and "depth", and optionally "ansatz" (a class, see
+             continuous_solver.ANSATZES), "optimizer", "batch_size" and "maxiter"
+             (see continuous_solver.optimize_parameters).
+    target_loss: stop all optimisations once one reaches this training loss.
+    max_workers: number of processes, the number of cores by default.
+    returns: one report per config, in the same order, with the config entries
+             plus "loss", "params", "time" (seconds) and "cancelled".
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=complex)
+    labels = np.ascontiguousarray(labels, dtype=float)
+    if max_workers is None:
+        max_workers = min(len(configs), os.cpu_count() or 1)
+
+    shm = shared_memory.SharedMemory(create=True, size=vectors.nbytes + labels.nbytes)
+    try:
+        np.ndarray(vectors.shape, dtype=complex, buffer=shm.buf)[:] = vectors
+        np.ndarray(labels.shape, dtype=float, buffer=shm.buf, offset=vectors.nbytes)[:] = labels
+        stop_event = multiprocessing.Event()
+
+        reports = [None] * len(configs)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shm.name, vectors.shape, labels.shape, stop_event)) as pool:
+            futures = {pool.submit(_run_restart, config, target_loss): idx
+                       for idx, config in enumerate(configs)}
+            for future in as_completed(futures):
+                report = future.result()
+                reports[futures[future]] = report
+                if target_loss is not None and report["loss"] <= target_loss:
+                    # restarts still queued stop at their first loss evaluation.
+                    stop_event.set()
+
+        return reports
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,132 @@
+"""Fitting the measured observable directly, instead of searching for a circuit.
+
+Every circuit U a solver could find predicts <psi|O|psi> with O = U^dagger Z...Z U.
+That is linear in O: writing O = sum_k c_k B_k in a basis of Hermitian matrices,
+the prediction is sum_k c_k <psi|B_k|psi> (the basis is orthonormal, so the
+size of c is the Frobenius norm of O). Fitting the labels is then a linear
+least squares problem in the 4**n real coefficients c, with one row of features
+per training sample, and no search at all.
+
+Any such O has eigenvalues in [-1, 1] (exactly +1 and -1, half of each), and
+so do the labels it produces. With constrain=True the least squares solution is
+refined by projected gradient descent onto {O : -1 <= O <= 1}, the semidefinite
+constraint, by clipping the eigenvalues. With round_to_unitary=True the
+eigenvalues are finally rounded to the +1/-1 of a parity observable, which also
+gives a unitary U with O = U^dagger Z...Z U (from the eigenvectors).
+"""
+from .helper_functions import split_training_data, inference_retval, parity_signs
+from .statevector import observable_expectation
+from . import instrumentation
+import functools
+import numpy as np
+
+
+def _hermitian_features(vectors):
+    """<psi|B_k|psi> for the orthonormal Hermitian basis E_ii, (E_ij + E_ji) / sqrt(2) and
+    i (E_ij - E_ji) / sqrt(2) (i < j): an N x 4**n matrix."""
+    outer = np.einsum("ni,nj->nij", vectors.conj(), vectors)  # conj(psi_i) psi_j
+    rows, cols = np.triu_indices(vectors.shape[1], k=1)
+    return np.concatenate([
+        outer[:, np.arange(vectors.shape[1]), np.arange(vectors.shape[1])].real,
+        np.sqrt(2) * outer[:, rows, cols].real,
+        -np.sqrt(2) * outer[:, rows, cols].imag,
+    ], axis=1)
+
+
+def _observable(coefficients, dimension):
+    """The Hermitian matrix sum_k c_k B_k, in the basis of _hermitian_features."""
+    rows, cols = np.triu_indices(dimension, k=1)
+    num_pairs = len(rows)
+    observable = np.diag(coefficients[:dimension]).astype(complex)
+    off_diagonal = (coefficients[dimension:dimension + num_pairs] + 1j * coefficients[dimension + num_pairs:]) / np.sqrt(2)
+    observable[rows, cols] = off_diagonal
+    observable[cols, rows] = off_diagonal.conj()
+    return observable
+
+
+def _coefficients(observable):
+    rows, cols = np.triu_indices(len(observable), k=1)
+    off_diagonal = np.sqrt(2) * observable[rows, cols]
+    return np.concatenate([observable.diagonal().real, off_diagonal.real, off_diagonal.imag])
+
+
+def _clip_eigenvalues(observable):
+    eigenvalues, eigenvectors = np.linalg.eigh(observable)
+    return (eigenvectors * np.clip(eigenvalues, -1, 1)) @ eigenvectors.conj().T
+
+
+def parity_unitary(observable):
+    """A unitary U such that U^dagger (Z x ... x Z) U is the parity observable closest to
+    `observable`: the eigenvectors of its d/2 largest eigenvalues get +1, the others -1."""
+    dimension = len(observable)
+    eigenvalues, eigenvectors = np.linalg.eigh(observable)  # ascending
+    signs = parity_signs(int(np.log2(dimension)))
+    # row k of U is the eigenvector sent to basis state k, which has parity signs[k].
+    unitary = np.empty((dimension, dimension), dtype=complex)
+    unitary[signs > 0] = eigenvectors[:, dimension // 2:].conj().T
+    unitary[signs < 0] = eigenvectors[:, :dimension // 2].conj().T
+    return unitary
+
+
+def observable_solver(training_data, regularization=1e-6, constrain=True, round_to_unitary=False,
+                      iterations=200):
+    """Fits the observable O with <psi|O|psi> = label by (constrained) linear least squares.
+
+    regularization: ridge penalty on the coefficients of O, which also picks the
+                    smallest O when there are fewer samples than 4**n unknowns.
+    constrain: keep the eigenvalues of O within [-1, 1].
+    round_to_unitary: round the eigenvalues to +1/-1, i.e. to U^dagger Z...Z U for some U.
+    iterations: number of projected gradient steps with constrain.
+    """
+    vectors, labels = split_training_data(training_data)
+    dimension = vectors.shape[1]
+
+    with instrumentation.timer("fit"):
+        features = _hermitian_features(vectors)
+        # ridge regression, solving the smaller of the N x N and 4**n x 4**n systems.
+        num_samples, num_coefficients = features.shape
+        if num_samples < num_coefficients:
+            coefficients = features.T @ np.linalg.solve(features @ features.T + regularization * np.eye(num_samples), labels)
+        else:
+            coefficients = np.linalg.solve(features.T @ features + regularization * np.eye(num_coefficients), features.T @ labels)
+
+        if constrain:
+            # projected gradient descent on the least squares loss, step 1 / Lipschitz constant.
+            step = 1.0 / (np.linalg.norm(features, 2) ** 2 + regularization)
+            coefficients = _coefficients(_clip_eigenvalues(_observable(coefficients, dimension)))
+            for _ in range(iterations):
+                gradient = features.T @ (features @ coefficients - labels) + regularization * coefficients
+                coefficients = _coefficients(_clip_eigenvalues(_observable(coefficients - step * gradient, dimension)))
+                instrumentation.count("objective_evaluations")
+
+        observable = _observable(coefficients, dimension)
+        unitary = None
+        if round_to_unitary:
+            unitary = parity_unitary(observable)
+            observable = unitary.conj().T @ np.diag(parity_signs(int(np.log2(dimension)))) @ unitary
+
+    residuals = observable_expectation(observable, vectors) - labels
+    print(f"Fitted a {dimension}x{dimension} observable, training loss {np.sum(residuals ** 2):.4f}")
+
+    return observable_inference(observable, unitary)
+
+
+def observable_inference(observable, unitary=None):
+    """The inference_retval for a fitted observable, also used to rebuild it from the training cache.
+
+    unitary: if known, a U with observable = U^dagger Z...Z U.
+    """
+
+    def infer(input_vector):
+        return observable_expectation(observable, input_vector)
+
+    description = "Observable fitted by linear least squares"
+    if unitary is not None:
+        description += ", the parity measured after a unitary found by eigendecomposition"
+
+    return inference_retval(
+        infer_fun = infer,
+        infer_batch = infer,
+        description = description + ".",
+        artifact = functools.partial(observable_inference, observable, unitary)
+    )
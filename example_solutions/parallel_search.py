@@ -0,0 +1,141 @@
+"""Exhaustive discrete search with candidate scoring spread over processes.
+
+The candidate circuits from circuit_enumeration.canonical_circuits are cut into
+chunks as they are generated and sent to a process pool, packed into arrays of
+indices into the (picklable) gate list. The training batch is shared with the
+workers through shared memory.
+
+The result is identical to the serial search in discrete_solver, which keeps
+the first circuit with the lowest cost and may stop at the first new best
+circuit that reaches stop_accuracy. Each worker returns the circuits of its
+chunk that beat everything before them in that chunk, and the main process
+merges those in chunk order. The best cost of the chunks merged so far is
+shared with the workers, which skip a candidate once the error on the first
+few training samples alone is already above it.
+"""
+from .circuit_enumeration import canonical_circuits, gate_unitaries, sequence_unitary
+from .circuit_search import accuracy
+from .statevector import unitary_observable, observable_expectation
+from .gates import pack_circuits
+from . import progress
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from multiprocessing import shared_memory
+import multiprocessing
+import itertools
+import os
+import numpy as np
+
+# Set in each worker process by _init_worker.
+_worker_state = {}
+
+
+def _init_worker(shm_name, vectors_shape, labels_shape, gates, num_qubits, shared_best):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    vectors = np.ndarray(vectors_shape, dtype=complex, buffer=shm.buf)
+    labels = np.ndarray(labels_shape, dtype=float, buffer=shm.buf, offset=vectors.nbytes)
+    _worker_state.update(shm=shm, vectors=vectors, labels=labels, matrices=gate_unitaries(gates, num_qubits),
+                         num_qubits=num_qubits, shared_best=shared_best)
+
+
+def _score_chunk(first_index, chunk, stop_accuracy, prune_rows):
+    state = _worker_state
+    vectors, labels = state["vectors"], state["labels"]
+    records = []
+    local_best = float('Inf')
+
+    for offset, indices in enumerate(chunk):
+        # the unitary the serial search gets from the enumeration, bit for bit.
+        unitary = sequence_unitary(indices[indices >= 0], state["matrices"], state["num_qubits"])
+        observable = unitary_observable(unitary, state["num_qubits"])
+
+        # Only the first rows, to see if this circuit can still win. The margin keeps
+        # rounding differences from pruning a tie.
+        bound = min(local_best, state["shared_best"].value)
+        partial = np.sum(np.abs(labels[:prune_rows] - observable_expectation(observable, vectors[:prune_rows])))
+        if partial > bound + 1e-9 * (1 + abs(bound)):
+            continue
+
+        # The full cost is computed exactly as in the serial search.
+        predicted_labels = observable_expectation(observable, vectors)
+        cost = np.sum(np.abs(labels - predicted_labels))
+        if cost < local_best:
+            local_best = cost
+            done = stop_accuracy is not None and accuracy(predicted_labels, labels) >= stop_accuracy
+            records.append((first_index + offset, cost, done))
+
+    return records
+
+
+def parallel_exhaustive_search(gates, vectors, labels, max_depth, num_qubits, stop_accuracy=None,
+                               max_workers=None, chunk_size=256):
+    """The parallel equivalent of discrete_solver's exhaustive search.
+
+    gates: picklable gates, e.g. gates.Gate objects.
+    max_workers: number of processes, the number of cores by default.
+    returns: (best_circuit, best_cost, number of circuits considered)
+    """
+    gates = list(gates)
+    vectors = np.ascontiguousarray(vectors, dtype=complex)
+    labels = np.ascontiguousarray(labels, dtype=float)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    prune_rows = max(1, len(labels) // 8)
+
+    candidates = canonical_circuits(gates, max_depth, num_qubits)
+
+    tracker = progress.Progress("parallel exhaustive search")
+    shm = shared_memory.SharedMemory(create=True, size=vectors.nbytes + labels.nbytes)
+    try:
+        np.ndarray(vectors.shape, dtype=complex, buffer=shm.buf)[:] = vectors
+        np.ndarray(labels.shape, dtype=float, buffer=shm.buf, offset=vectors.nbytes)[:] = labels
+        shared_best = multiprocessing.Value('d', float('Inf'))
+
+        best_circuit, best_cost = None, float('Inf')
+        num_submitted, num_circuits = 0, None
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shm.name, vectors.shape, labels.shape, gates,
+                                           num_qubits, shared_best)) as pool:
+            in_flight = deque()
+
+            def submit_next():
+                nonlocal num_submitted
+                chunk = list(itertools.islice(candidates, chunk_size))
+                if not chunk:
+                    return False
+                future = pool.submit(_score_chunk, num_submitted, pack_circuits(chunk, gates),
+                                     stop_accuracy, prune_rows)
+                in_flight.append((future, num_submitted, chunk))
+                num_submitted += len(chunk)
+                return True
+
+            while len(in_flight) < 2 * max_workers and submit_next():
+                pass
+
+            # merge in submission order, so that ties are resolved as in the serial search.
+            while in_flight and num_circuits is None:
+                future, first_index, chunk = in_flight.popleft()
+                chunk_best = None
+                for index, cost, done in future.result():
+                    if cost < best_cost:
+                        best_circuit, best_cost = chunk[index - first_index], cost
+                        chunk_best = best_circuit
+                        if done:
+                            num_circuits = index + 1
+                            break
+                tracker.update(chunk_best, best_cost, n=len(chunk))
+                with shared_best.get_lock():
+                    shared_best.value = best_cost
+                if num_circuits is None:
+                    submit_next()
+
+            for future, _, _ in in_flight:
+                future.cancel()
+    finally:
+        shm.close()
+        shm.unlink()
+        tracker.close()
+
+    if num_circuits is None:
+        num_circuits = num_submitted
+    return best_circuit, best_cost, num_circuits
@@ -0,0 +1,103 @@
+"""Parametrised circuits compiled once and re-bound cheaply.
+
+An optimiser evaluates the same circuit structure thousands of times with
+different rotation angles. ParametricProgram takes the gate list of such a
+circuit ((name, qubits, param_index) tuples, param_index None for fixed gates)
+and keeps one preallocated 2x2 matrix per rotation. Binding a parameter vector
+only overwrites the entries of those matrices, all rotations of a kind at once,
+and running the program applies the matrices to a batch of statevectors. No
+Qiskit objects are created until to_circuit() is called; to_gates() gives the
+bound circuit as Gates, which are drawn without Qiskit.
+"""
+from .helper_functions import compute_parity_exp_value
+from .statevector import apply_gate, gate_matrix
+from .gates import Gate
+from . import instrumentation
+import numpy as np
+
+ROTATION_GATES = ("rx", "ry", "rz")
+
+
+class ParametricProgram(object):
+
+    def __init__(self, gate_list, num_qubits):
+        self.gate_list = list(gate_list)
+        self.num_qubits = num_qubits
+        self.num_params = 1 + max([p for _, _, p in self.gate_list if p is not None], default=-1)
+
+        rotations = [(position, name, param_index)
+                     for position, (name, qubits, param_index) in enumerate(self.gate_list)
+                     if param_index is not None]
+        for position, name, param_index in rotations:
+            if name not in ROTATION_GATES:
+                raise ValueError(f"Only {', '.join(ROTATION_GATES)} can be parametrised, not '{name}'.")
+
+        # One 2x2 matrix per rotation, rebound in place by bind().
+        self._rotation_matrices = np.zeros((len(rotations), 2, 2), dtype=complex)
+        self._matrices = [None] * len(self.gate_list)
+        self._slots = {}
+        for slot, (position, name, param_index) in enumerate(rotations):
+            self._matrices[position] = self._rotation_matrices[slot]
+            self._slots.setdefault(name, ([], []))
+            self._slots[name][0].append(slot)
+            self._slots[name][1].append(param_index)
+        self._slots = {name: (np.array(slots), np.array(indices)) for name, (slots, indices) in self._slots.items()}
+
+        for position, (name, qubits, param_index) in enumerate(self.gate_list):
+            if param_index is None:
+                self._matrices[position] = gate_matrix(name)
+
+    def bind(self, params):
+        """Writes the rotation angles into the preallocated matrices.
+
+        returns: the list of gate matrices, one per entry of gate_list.
+        """
+        params = np.asarray(params, dtype=float)
+        m = self._rotation_matrices
+        for name, (slots, indices) in self._slots.items():
+            half = params[indices] / 2
+            c, s = np.cos(half), np.sin(half)
+            if name == "rx":
+                m[slots, 0, 0] = c
+                m[slots, 0, 1] = -1j * s
+                m[slots, 1, 0] = -1j * s
+                m[slots, 1, 1] = c
+            elif name == "ry":
+                m[slots, 0, 0] = c
+                m[slots, 0, 1] = -s
+                m[slots, 1, 0] = s
+                m[slots, 1, 1] = c
+            else:
+                m[slots, 0, 0] = c - 1j * s
+                m[slots, 1, 1] = c + 1j * s
+        return self._matrices
+
+    def run(self, params, states):
+        """The final statevector(s) for a single input statevector or a (N x 2**n) matrix."""
+        instrumentation.count("simulator_runs")
+        states = np.asarray(states, dtype=complex)
+        single = states.ndim == 1
+        states = np.atleast_2d(states)
+        for (name, qubits, param_index), matrix in zip(self.gate_list, self.bind(params)):
+            states = apply_gate(states, matrix, qubits, self.num_qubits)
+        return states[0] if single else states
+
+    def predict(self, params, states):
+        """The parity expectation value for each input statevector."""
+        return compute_parity_exp_value(self.run(params, states))
+
+    def to_gates(self, params):
+        """The circuit with the parameters bound, as a tuple of Gates."""
+        return tuple(Gate(name, qubits, () if param_index is None else (float(params[param_index]),))
+                     for name, qubits, param_index in self.gate_list)
+
+    def to_circuit(self, params):
+        """A Qiskit circuit with the parameters bound, e.g. for printing."""
+        from qiskit import QuantumCircuit, QuantumRegister
+
+        qr = QuantumRegister(self.num_qubits, "qr")
+        circ = QuantumCircuit(qr)
+        for name, qubits, param_index in self.gate_list:
+            angles = [] if param_index is None else [params[param_index]]
+            getattr(circ, name)(*angles, *[qr[q] for q in qubits])
+        return circ
@@ -0,0 +1,179 @@
+"""Progress of a long search: rate limited status lines, verbosity levels and a trace.
+
+The search loops report every candidate they score:
+
+    with progress.Progress("exhaustive search") as tracker:
+        for circuit in candidates:
+            ...
+            tracker.update(circuit, cost)
+
+and a status line (candidates per second, best cost so far, time against the
+problem's TimeEst) is printed at most every `interval` seconds. A candidate is
+only turned into a string when a line about it is actually printed, so the
+loop does no formatting work at the default verbosity.
+
+The verbosity levels, set by evaluate.py with configure():
+
+    QUIET    nothing
+    NORMAL   summaries and the status lines
+    VERBOSE  also the allowable gates and every new best candidate
+    DEBUG    also every candidate, one line each (slow for big searches)
+
+With a trace file, the top_k candidates with the lowest cost so far are appended
+to it as a line of JSON with every status line, and once more at the end. The
+lines are formatted and written by a background thread.
+"""
+import heapq
+import json
+import queue
+import threading
+import time
+
+QUIET, NORMAL, VERBOSE, DEBUG = range(4)
+
+_settings = {
+    "verbosity": NORMAL,
+    "interval": 5.0,  # seconds between status lines.
+    "time_estimate": None,  # the problem's TimeEst, in seconds.
+    "trace": None,  # path of the JSONL trace file.
+    "top_k": 10,
+}
+
+
+def configure(**settings):
+    """Changes some of the settings: verbosity, interval, time_estimate, trace and top_k."""
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError(f"Unknown progress settings {sorted(unknown)}, use some of {sorted(_settings)}.")
+    _settings.update(settings)
+
+
+def enabled(level):
+    return _settings["verbosity"] >= level
+
+
+def log(message, level=NORMAL):
+    """Prints message if the verbosity is at least level.
+
+    message: a string, or a function returning one, which is then only called if printed.
+    """
+    if _settings["verbosity"] >= level:
+        print(message() if callable(message) else message)
+
+
+def describe(candidate):
+    """A circuit (tuple of gates) as "h[0] -> cx[0, 1]", anything else with str()."""
+    if isinstance(candidate, tuple) and all(isinstance(gate, tuple) for gate in candidate):
+        return " -> ".join(map(str, candidate))
+    return str(candidate)
+
+
+def _write_trace(path, records):
+    with open(path, "a") as f:
+        while True:
+            record = records.get()
+            if record is None:
+                return
+            record["top"] = [{"candidate": describe(candidate), "cost": -negative_cost}
+                             for negative_cost, _, candidate in record["top"]]
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+
+
+class Progress(object):
+
+    def __init__(self, name, total=None):
+        """name: what is being searched, the start of every line printed.
+        total: the number of candidates, if known in advance, for an ETA.
+        """
+        self.name = name
+        self.total = total
+        self.count = 0
+        self.best = None
+        self.best_cost = float('Inf')
+
+        # the settings are read once, rather than on every update.
+        self._verbosity = _settings["verbosity"]
+        self._interval = _settings["interval"]
+        self._time_estimate = _settings["time_estimate"]
+        self._start = self._last_status = time.monotonic()
+
+        # max heap of (-cost, -count, candidate): the root is the worst of the top_k.
+        self._top = []
+        self._top_k = 0
+        self._writer = None
+        if _settings["trace"] is not None:
+            self._top_k = _settings["top_k"]
+            self._records = queue.Queue()
+            self._writer = threading.Thread(target=_write_trace, args=(_settings["trace"], self._records),
+                                            daemon=True)
+            self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, candidate, cost=None, n=1):
+        """Records n more scored candidates, the best of which is `candidate` with `cost`.
+
+        candidate: None if none of them is worth recording (e.g. pruned ones).
+        """
+        self.count += n
+        if candidate is not None:
+            if self._verbosity >= DEBUG:
+                print(f"{self.name}: {describe(candidate)}, cost {cost:.2f}")
+            if cost < self.best_cost:
+                self.best, self.best_cost = candidate, cost
+                if self._verbosity >= VERBOSE:
+                    print(f"{self.name}: new best {describe(candidate)}, cost {cost:.4f} "
+                          f"after {self.count} candidates")
+            if self._top_k:
+                # on equal costs, the earlier candidate stays.
+                entry = (-float(cost), -self.count, candidate)
+                if len(self._top) < self._top_k:
+                    heapq.heappush(self._top, entry)
+                elif entry > self._top[0]:
+                    heapq.heapreplace(self._top, entry)
+
+        now = time.monotonic()
+        if now - self._last_status >= self._interval:
+            self._status(now)
+
+    def status_line(self, elapsed):
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        line = (f"{self.name}: {self.count} candidates ({rate:.0f}/s), "
+                f"best cost {self.best_cost:.4f}, {elapsed:.0f}s elapsed")
+        finish = elapsed
+        if self.total is not None and rate > 0:
+            eta = max(self.total - self.count, 0) / rate
+            finish += eta
+            line += f", ETA {eta:.0f}s"
+        if self._time_estimate:
+            line += f" ({finish / self._time_estimate:.0%} of the TimeEst of {self._time_estimate}s)"
+        return line
+
+    def _status(self, now):
+        self._last_status = now
+        if self._verbosity >= NORMAL:
+            print(self.status_line(now - self._start))
+        self._trace(now)
+
+    def _trace(self, now):
+        if self._writer is not None:
+            self._records.put({
+                "name": self.name,
+                "elapsed": now - self._start,
+                "candidates": self.count,
+                "best_cost": None if self.best is None else float(self.best_cost),
+                "top": sorted(self._top, reverse=True),
+            })
+
+    def close(self):
+        """Writes the last trace line and waits for the trace to be written."""
+        if self._writer is not None:
+            self._trace(time.monotonic())
+            self._records.put(None)
+            self._writer.join()
+            self._writer = None
@@ -0,0 +1,124 @@
+"""An SVM on a quantum kernel: the overlap of the statevectors themselves.
+
+The fidelity kernel k(psi, phi) = |<psi|phi>|**2 is the inner product of the
+density matrices |psi><psi| and |phi><phi|. Every label of the form
+<psi|U^dagger Z...Z U|psi> is a linear function of |psi><psi|, so a linear
+classifier in this kernel's feature space can represent any circuit a discrete
+or continuous solver could find, and the SVM finds it as a convex problem.
+
+The "parity" kernel is the fidelity kernel of the parity-projected states: with
+P_even and P_odd the projectors onto the basis states of even and odd parity
+(the +1 and -1 eigenspaces of Z...Z), k = |<psi|P_even|phi>|**2 + |<psi|P_odd|phi>|**2.
+It ignores the coherences between the two sectors.
+
+The "probabilities" kernel only compares the computational basis probabilities
+|psi_k|**2, i.e. what a measurement without any circuit sees.
+
+Kernel matrices are computed as matrix products, a block of rows at a time so
+that the memory stays bounded. The training Gram matrix can be cached on disk
+per training set (cache_dir), in a directory kept below cache_size_mb by deleting
+the least recently used entries. At test time only the kernel rows against the
+support vectors are computed.
+"""
+from .helper_functions import split_training_data, inference_retval, parity_signs
+from .disk_cache import data_fingerprint, evict, replace_file
+from . import instrumentation
+import functools
+import os
+import numpy as np
+
+KERNELS = ("fidelity", "parity", "probabilities")
+
+
+def kernel_matrix(a, b, kernel="fidelity", block_size=1024):
+    """The (len(a) x len(b)) kernel matrix between two sets of statevectors (one per row)."""
+    a = np.asarray(a, dtype=complex)
+    b = np.asarray(b, dtype=complex)
+    if kernel == "probabilities":
+        a, b = np.abs(a) ** 2, np.abs(b) ** 2
+    elif kernel == "parity":
+        even = parity_signs(int(np.log2(a.shape[1]))) > 0
+    elif kernel != "fidelity":
+        raise ValueError(f"Unknown kernel '{kernel}', use one of {KERNELS}.")
+
+    result = np.empty((len(a), len(b)))
+    for start in range(0, len(a), block_size):
+        block = a[start:start + block_size]
+        if kernel == "parity":
+            result[start:start + block_size] = (np.abs(block[:, even].conj() @ b[:, even].T) ** 2
+                                                + np.abs(block[:, ~even].conj() @ b[:, ~even].T) ** 2)
+        elif kernel == "fidelity":
+            result[start:start + block_size] = np.abs(block.conj() @ b.T) ** 2
+        else:
+            result[start:start + block_size] = (block.conj() @ b.T).real
+    instrumentation.count("kernel_entries", result.size)
+    return result
+
+
+def _cached_gram_matrix(vectors, labels, kernel, block_size, cache_dir, max_bytes):
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"{kernel}_{data_fingerprint(vectors, labels)}.npy")
+        if os.path.exists(path):
+            os.utime(path) # most recently used.
+            return np.load(path)
+
+    gram = kernel_matrix(vectors, vectors, kernel, block_size)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        replace_file(path, lambda f: np.save(f, gram))
+        evict(cache_dir, ".npy", max_bytes)
+    return gram
+
+
+def quantum_kernel_svm(training_data, kernel="fidelity", C=8.0, block_size=1024, cache_dir=None,
+                       cache_size_mb=512):
+    """Fits an SVM with a precomputed quantum kernel.
+
+    kernel: "fidelity" (|<psi|phi>|**2), "parity" (the fidelity within each parity
+            sector) or "probabilities" (overlap of the |psi_k|**2).
+    C: the SVM's regularisation parameter.
+    block_size: number of kernel matrix rows computed at a time.
+    cache_dir: directory to cache the Gram matrices in, e.g. ".kernel_cache". Not cached by default.
+    cache_size_mb: the least recently used Gram matrices are deleted beyond this size.
+    """
+    from sklearn.svm import SVC
+
+    vectors, labels = split_training_data(training_data)
+
+    with instrumentation.timer("kernel"):
+        gram = _cached_gram_matrix(vectors, labels, kernel, block_size, cache_dir, cache_size_mb * 2**20)
+
+    clf = SVC(kernel="precomputed", C=C)
+    with instrumentation.timer("optimizer"):
+        clf.fit(gram, labels)
+    print(f"Fitted an SVM on the {kernel} kernel with {len(clf.support_)} support vectors out of {len(labels)} samples.")
+
+    return quantum_kernel_inference(vectors[clf.support_], clf.dual_coef_[0], clf.intercept_[0],
+                                    tuple(clf.classes_), kernel, block_size)
+
+
+def quantum_kernel_inference(support_vectors, dual_coef, intercept, classes, kernel="fidelity", block_size=1024):
+    """The inference_retval for a fitted SVM, also used to rebuild it from the training cache.
+
+    The decision function is sum_i dual_coef_i k(x, support_vector_i) + intercept,
+    positive for the second of the two classes.
+    """
+
+    def infer_batch(wavefunctions):
+        wavefunctions = np.asarray(wavefunctions, dtype=complex)
+        decision = kernel_matrix(wavefunctions.reshape(-1, wavefunctions.shape[-1]), support_vectors,
+                                 kernel, block_size) @ dual_coef + intercept
+        return np.where(decision > 0, classes[-1], classes[0])
+
+    def infer(wavefunction):
+        return infer_batch(np.reshape(wavefunction, (1, -1)))[0]
+
+    return inference_retval(
+        infer_fun = infer,
+        infer_batch = infer_batch,
+        description = f"SVM on the {kernel} kernel with {len(support_vectors)} support vectors.",
+        artifact = functools.partial(quantum_kernel_inference, support_vectors, dual_coef, intercept,
+                                     classes, kernel, block_size)
+    )
@@ -0,0 +1,122 @@
+"""Scoring candidate circuits on as few training samples as possible.
+
+The exhaustive search scores every candidate on every training sample, but most
+candidates are ruled out by a handful of samples, and many samples repeat each
+other (the same state up to a global phase carries the same information for a
+parity classifier).
+
+compressed_search first merges duplicate samples into one sample with a weight
+(its multiplicity), so the weighted training error is the same as before. It
+then scores all candidates on a small subset of the samples, and repeats:
+
+ - the leader (lowest error on the subset) is scored on all samples, and every
+   candidate whose error on the subset alone is already above the leader's full
+   error is dropped: it cannot be the best circuit;
+ - the samples on which the surviving candidates disagree most are added to
+   the subset, and only the survivors are scored on them;
+
+until one candidate is left, the survivors agree on all remaining samples, or
+all samples are in the subset. The result is a circuit with the lowest training
+error, the first one in enumeration order among equals (errors within rounding
+of each other may be ordered differently than in the exhaustive search). The work after the first round scales with
+the number of survivors rather than with the number of candidates.
+"""
+from .circuit_enumeration import canonical_circuits
+from .statevector import unitary_observable
+from . import instrumentation
+from . import progress
+import hashlib
+import numpy as np
+
+
+def deduplicate(vectors, labels, decimals=8):
+    """Merges samples with the same label and the same statevector up to a global phase.
+
+    returns: (index of the first sample of each group, number of samples in each group)
+    """
+    vectors = np.asarray(vectors, dtype=complex)
+    group_of_key = {}
+    first, weights = [], []
+    for idx, (vector, label) in enumerate(zip(vectors, labels)):
+        pivot = vector[np.argmax(np.round(np.abs(vector), 6))]
+        normalised = np.round(vector * (abs(pivot) / pivot), decimals) + (0.0 + 0.0j)  # + 0 turns -0.0 into 0.0
+        key = hashlib.blake2b(normalised.tobytes() + repr(float(label)).encode(), digest_size=16).digest()
+        if key in group_of_key:
+            weights[group_of_key[key]] += 1
+        else:
+            group_of_key[key] = len(first)
+            first.append(idx)
+            weights.append(1)
+    return np.array(first, dtype=int), np.array(weights, dtype=float)
+
+
+def _predictions(observables, outer_products):
+    """<v|O|v> = sum_ij O_ij conj(v_i) v_j for every flattened observable (K x d**2) and
+    every flattened outer product conj(v) v^T (N x d**2): a K x N matrix, in one matrix product."""
+    instrumentation.count("sample_evaluations", len(observables) * len(outer_products))
+    return (observables @ outer_products.T).real
+
+
+def compressed_search(gates, vectors, labels, max_depth, num_qubits, initial_samples=8,
+                      probe_candidates=64, block_size=1024):
+    """The circuit with the lowest training error, scored on as few samples as possible.
+
+    initial_samples: size of the first subset, which is doubled every round.
+    probe_candidates: the number of survivors whose disagreement picks the next samples.
+    block_size: number of candidates scored at a time.
+    returns: (best_circuit, best_cost, number of circuits considered)
+    """
+    vectors = np.asarray(vectors, dtype=complex)
+    labels = np.asarray(labels, dtype=float)
+    keep, weights = deduplicate(vectors, labels)
+    vectors, labels = vectors[keep], labels[keep]
+    num_samples = len(labels)
+
+    circuits, observables = [], []
+    for circuit, unitary in canonical_circuits(gates, max_depth, num_qubits, with_unitaries=True):
+        circuits.append(circuit)
+        observables.append(unitary_observable(unitary, num_qubits).ravel())
+    observables = np.array(observables)
+    outer_products = np.einsum("ni,nj->nij", vectors.conj(), vectors).reshape(num_samples, -1)
+    progress.log(f"{len(circuits)} circuits, {num_samples} distinct training samples.")
+
+    def weighted_costs(candidates, samples):
+        costs = np.empty(len(candidates))
+        for start in range(0, len(candidates), block_size):
+            block = candidates[start:start + block_size]
+            predictions = _predictions(observables[block], outer_products[samples])
+            costs[start:start + block_size] = np.abs(labels[samples] - predictions) @ weights[samples]
+        return costs
+
+    survivors = np.arange(len(circuits))
+    partial_costs = np.zeros(len(circuits))
+    selected = np.zeros(num_samples, dtype=bool)
+    new_samples = np.arange(min(initial_samples, num_samples))
+
+    while True:
+        selected[new_samples] = True
+        partial_costs[survivors] += weighted_costs(survivors, new_samples)
+
+        # argmin returns the first of equals, i.e. the first circuit in enumeration order.
+        leader = survivors[np.argmin(partial_costs[survivors])]
+        leader_cost = weighted_costs(np.array([leader]), np.arange(num_samples))[0]
+        tolerance = 1e-9 * (1 + abs(leader_cost)) # rounding must not drop a tie.
+        survivors = survivors[partial_costs[survivors] <= leader_cost + tolerance]
+        progress.log(f"Scored on {np.count_nonzero(selected)} samples, {len(survivors)} circuits left.")
+
+        remaining = np.flatnonzero(~selected)
+        if len(survivors) == 1 or len(remaining) == 0:
+            break
+
+        # The samples the survivors disagree on most (weighted by multiplicity) tell
+        # them apart fastest. Samples they all agree on never change the ranking.
+        probe = survivors[np.linspace(0, len(survivors) - 1, min(probe_candidates, len(survivors))).astype(int)]
+        disagreement = np.var(_predictions(observables[probe], outer_products[remaining]), axis=0) * weights[remaining]
+        if len(probe) == len(survivors) and disagreement.max() < 1e-12:
+            break # the remaining samples add the same error to every survivor.
+        order = np.argsort(-disagreement, kind="stable")
+        new_samples = remaining[order[:np.count_nonzero(selected)]]
+
+    best = survivors[np.argmin(partial_costs[survivors])]
+    best_cost = weighted_costs(np.array([best]), np.arange(num_samples))[0]
+    return circuits[best], best_cost, len(circuits)
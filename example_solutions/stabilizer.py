@@ -0,0 +1,173 @@
+"""Clifford circuits as stabilizer tableaux.
+
+The discrete problems only use Clifford gates (H, X, Y, Z, S, CX, ...). A
+Clifford circuit U maps Pauli strings to Pauli strings under conjugation, so it
+is fully described by where it sends each X_q and Z_q: its tableau. The parity
+observable seen through the circuit, U^dagger (Z x ... x Z) U, is then a single
+Pauli string, and its expectation value on a statevector can be computed with
+an index permutation and a sign flip. None of this needs 2**n x 2**n matrices.
+
+A Pauli string is a tuple (x, z, r) standing for i**r X**x Z**z, where x and z
+are bit masks over the qubits (qubit q is bit q, as in the statevector index)
+and X**x Z**z is the product over qubits of X_q**x_q Z_q**z_q.
+"""
+from .helper_functions import parity_signs
+from .statevector import circuit_operations
+from .circuit_search import accuracy
+import numpy as np
+
+
+def pauli_product(a, b):
+    """The product a.b of two Pauli strings."""
+    xa, za, ra = a
+    xb, zb, rb = b
+    # Z**za X**xb = (-1)**|za & xb| X**xb Z**za
+    r = (ra + rb + 2 * bin(za & xb).count("1")) % 4
+    return (xa ^ xb, za ^ zb, r)
+
+
+def _single_qubit_images(q):
+    # Heisenberg images G^dagger X_q G and G^dagger Z_q G of the single qubit Cliffords.
+    X, Z, Y = (1 << q, 0, 0), (0, 1 << q, 0), (1 << q, 1 << q, 1)
+    minus = lambda p: (p[0], p[1], (p[2] + 2) % 4)
+    return {
+        "id":   (X, Z),
+        "iden": (X, Z),
+        "x":    (X, minus(Z)),
+        "y":    (minus(X), minus(Z)),
+        "z":    (minus(X), Z),
+        "h":    (Z, X),
+        "s":    (minus(Y), Z),
+        "sdg":  (Y, Z),
+    }
+
+
+class Tableau(object):
+    """The Heisenberg picture action P -> U^dagger P U of a Clifford circuit U,
+    stored as the images of X_q and Z_q for every qubit q."""
+
+    def __init__(self, num_qubits, x_images=None, z_images=None):
+        self.num_qubits = num_qubits
+        self.x_images = tuple(x_images) if x_images is not None else tuple((1 << q, 0, 0) for q in range(num_qubits))
+        self.z_images = tuple(z_images) if z_images is not None else tuple((0, 1 << q, 0) for q in range(num_qubits))
+
+    def key(self):
+        return self.x_images + self.z_images
+
+    def __eq__(self, other):
+        return isinstance(other, Tableau) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def conjugate(self, pauli):
+        """U^dagger P U for a Pauli string P, in O(n) Pauli products."""
+        x, z, r = pauli
+        result = (0, 0, r)
+        for q in range(self.num_qubits):
+            if (x >> q) & 1:
+                result = pauli_product(result, self.x_images[q])
+        for q in range(self.num_qubits):
+            if (z >> q) & 1:
+                result = pauli_product(result, self.z_images[q])
+        return result
+
+    def compose(self, other):
+        """The tableau of the circuit `self` followed by the circuit `other`.
+
+        (V U)^dagger P (V U) = U^dagger (V^dagger P V) U, so the images of `other`
+        are conjugated by `self`: O(n**2) Pauli products.
+        """
+        return Tableau(self.num_qubits,
+                       [self.conjugate(p) for p in other.x_images],
+                       [self.conjugate(p) for p in other.z_images])
+
+    def parity_observable(self):
+        """U^dagger (Z x ... x Z) U as a Pauli string."""
+        return self.conjugate((0, (1 << self.num_qubits) - 1, 0))
+
+    @classmethod
+    def from_gate(cls, name, qubits, num_qubits):
+        tableau = cls(num_qubits)
+        x_images, z_images = list(tableau.x_images), list(tableau.z_images)
+
+        if len(qubits) == 1:
+            q = qubits[0]
+            images = _single_qubit_images(q)
+            if name not in images:
+                raise ValueError(f"'{name}' is not a Clifford gate the stabilizer engine knows.")
+            x_images[q], z_images[q] = images[name]
+        elif name == "cx":
+            c, t = qubits
+            x_images[c] = (1 << c | 1 << t, 0, 0)
+            z_images[t] = (0, 1 << c | 1 << t, 0)
+        elif name == "cz":
+            a, b = qubits
+            x_images[a] = (1 << a, 1 << b, 0)
+            x_images[b] = (1 << b, 1 << a, 0)
+        elif name == "swap":
+            a, b = qubits
+            x_images[a], x_images[b] = x_images[b], x_images[a]
+            z_images[a], z_images[b] = z_images[b], z_images[a]
+        else:
+            raise ValueError(f"'{name}' is not a Clifford gate the stabilizer engine knows.")
+
+        return cls(num_qubits, x_images, z_images)
+
+    @classmethod
+    def from_circuit(cls, circuit, num_qubits):
+        """The tableau of a circuit (anything statevector.circuit_operations accepts)."""
+        tableau = cls(num_qubits)
+        for name, qubits, params in circuit_operations(circuit, num_qubits):
+            tableau = tableau.compose(cls.from_gate(name, qubits, num_qubits))
+        return tableau
+
+
+def pauli_expectation(pauli, states):
+    """<psi|P|psi> for a single statevector or for each row of a (N x 2**n) matrix."""
+    states = np.asarray(states, dtype=complex)
+    x, z, r = pauli
+    num_qubits = int(np.log2(states.shape[-1]))
+    flipped = np.arange(2 ** num_qubits) ^ x
+    # (P psi)[j] = i**r (-1)**|(j ^ x) & z| psi[j ^ x]
+    signs = parity_signs(num_qubits)[flipped & z] * (1j ** r)
+    return np.einsum("...i,...i->...", states.conj(), signs * states[..., flipped]).real
+
+
+def clifford_search(gates, vectors, labels, max_depth, num_qubits, stop_accuracy=None):
+    """Finds the Clifford circuit of at most max_depth gates with the lowest
+    training cost, by walking backwards from the parity observable.
+
+    Prepending a gate G to a circuit S turns its parity observable O into
+    G^dagger O G, which only depends on O. So circuits are deduplicated by their
+    observable, and every distinct Pauli string is scored once, no matter how
+    many circuits produce it.
+
+    returns: (best_circuit, best_cost, number of observables scored, best observable)
+    """
+    tableaux = [Tableau.from_circuit((gate,), num_qubits) for gate in gates]
+    start = (0, (1 << num_qubits) - 1, 0)
+    seen = set()
+    best = ((), float('Inf'), start)
+
+    # the breadth first walk, with the empty circuit as the first candidate.
+    pending = [((), start)]
+    for depth in range(max_depth + 1):
+        frontier, pending = pending, []
+        for circuit, pauli in frontier:
+            if pauli in seen:
+                continue
+            seen.add(pauli)
+
+            predictions = pauli_expectation(pauli, vectors)
+            cost = np.sum(np.abs(labels - predictions))
+            if cost < best[1]:
+                best = (circuit, cost, pauli)
+                if stop_accuracy is not None and accuracy(predictions, labels) >= stop_accuracy:
+                    return best[0], best[1], len(seen), best[2]
+
+            if depth < max_depth:
+                pending.extend(((gate,) + circuit, tableau.conjugate(pauli))
+                               for gate, tableau in zip(gates, tableaux))
+
+    return best[0], best[1], len(seen), best[2]
@@ -0,0 +1,268 @@
+"""A small batched statevector simulator written in NumPy.
+
+BasicAer's statevector_simulator runs one job per initial state, and the job
+setup dominates for the tiny circuits used in the hackathon. Here a circuit is
+applied to a whole (N_samples x 2**n) matrix of statevectors at once.
+
+Qubit ordering matches Qiskit: qubit i is bit i of the basis state index.
+"""
+from .helper_functions import parity_signs
+from . import instrumentation
+from functools import lru_cache
+import numpy as np
+
+_SQRT_HALF = 1 / np.sqrt(2)
+
+FIXED_GATES = {
+    "id":   np.eye(2, dtype=complex),
+    "iden": np.eye(2, dtype=complex),
+    "x":    np.array([[0, 1], [1, 0]], dtype=complex),
+    "y":    np.array([[0, -1j], [1j, 0]], dtype=complex),
+    "z":    np.array([[1, 0], [0, -1]], dtype=complex),
+    "h":    np.array([[1, 1], [1, -1]], dtype=complex) * _SQRT_HALF,
+    "s":    np.array([[1, 0], [0, 1j]], dtype=complex),
+    "sdg":  np.array([[1, 0], [0, -1j]], dtype=complex),
+    "t":    np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=complex),
+    "tdg":  np.array([[1, 0], [0, np.exp(-1j * np.pi / 4)]], dtype=complex),
+    "swap": np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=complex),
+}
+
+
+def _controlled(matrix):
+    # two qubit matrices use the first listed qubit as the most significant bit,
+    # so the control is the first qubit.
+    result = np.eye(4, dtype=complex)
+    result[2:, 2:] = matrix
+    return result
+
+for _name in ("x", "y", "z", "h"):
+    FIXED_GATES["c" + _name] = _controlled(FIXED_GATES[_name])
+
+
+def rx_matrix(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -1j * s], [-1j * s, c]], dtype=complex)
+
+def ry_matrix(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -s], [s, c]], dtype=complex)
+
+def rz_matrix(theta):
+    return np.array([[np.exp(-0.5j * theta), 0], [0, np.exp(0.5j * theta)]], dtype=complex)
+
+def u3_matrix(theta, phi, lam):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -np.exp(1j * lam) * s],
+                     [np.exp(1j * phi) * s, np.exp(1j * (phi + lam)) * c]], dtype=complex)
+
+PARAMETRIC_GATES = {
+    "rx": rx_matrix,
+    "ry": ry_matrix,
+    "rz": rz_matrix,
+    "u1": lambda lam: u3_matrix(0.0, 0.0, lam),
+    "u2": lambda phi, lam: u3_matrix(np.pi / 2, phi, lam),
+    "u3": u3_matrix,
+    "crz": lambda theta: _controlled(rz_matrix(theta)),
+}
+
+
+def gate_matrix(name, params=()):
+    """Returns the unitary of a named gate as a (2**k x 2**k) array."""
+    if name in FIXED_GATES:
+        return FIXED_GATES[name]
+    if name in PARAMETRIC_GATES:
+        return PARAMETRIC_GATES[name](*params)
+    raise ValueError(f"The statevector simulator does not know the gate '{name}'.")
+
+
+class _QubitIndex(int):
+    """An int that remembers it came from a register, so that it can be told
+    apart from gate parameters when recording a gate application."""
+
+
+class RecordingRegister(object):
+    """Stands in for a QuantumRegister: indexing it yields qubit indices."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, idx):
+        return _QubitIndex(idx)
+
+
+class RecordingCircuit(object):
+    """Stands in for a QuantumCircuit and records every gate applied to it as
+    an operation tuple (name, qubits, params)."""
+
+    def __init__(self, num_qubits):
+        self.num_qubits = num_qubits
+        self.operations = []
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def record(*args):
+            params = tuple(float(a) for a in args if not isinstance(a, (_QubitIndex, RecordingRegister)))
+            qubit_args = [a for a in args if isinstance(a, (_QubitIndex, RecordingRegister))]
+            if len(qubit_args) == 1 and isinstance(qubit_args[0], RecordingRegister):
+                # a gate applied to a whole register, e.g. circ.iden(qr)
+                for q in range(len(qubit_args[0])):
+                    self.operations.append((name, (q,), params))
+            else:
+                self.operations.append((name, tuple(int(q) for q in qubit_args), params))
+            return self
+
+        return record
+
+
+def _qiskit_operations(circuit):
+    operations = []
+    for entry in circuit.data:
+        # Qiskit stores (instruction, qargs, cargs) tuples from terra 0.8 onwards,
+        # and plain instructions with a qargs attribute before that.
+        if isinstance(entry, tuple):
+            instruction, qargs = entry[0], entry[1]
+        else:
+            instruction, qargs = entry, entry.qargs
+        if instruction.name == "barrier":
+            continue
+        params = getattr(instruction, "params", None)
+        if params is None:
+            params = getattr(instruction, "param", [])
+        qubits = tuple(q[1] if isinstance(q, tuple) else q.index for q in qargs)
+        operations.append((instruction.name, qubits, tuple(float(p) for p in params)))
+    return operations
+
+
+def circuit_operations(circuit, num_qubits):
+    """Converts a circuit into a list of (name, qubits, params) tuples.
+
+    The circuit may be a Qiskit QuantumCircuit, a sequence of gate application
+    functions (as used by the solvers, e.g. lambda circ, qreg: circ.h(qreg[0]))
+    or a sequence of operation tuples already.
+    """
+    if hasattr(circuit, "data"):
+        return _qiskit_operations(circuit)
+
+    operations = []
+    for gate in circuit:
+        if isinstance(gate, tuple):
+            name, qubits, params = gate
+            operations.append((name, tuple(qubits), tuple(params)))
+        else:
+            recorder = RecordingCircuit(num_qubits)
+            gate(recorder, RecordingRegister(num_qubits))
+            operations.extend(recorder.operations)
+    return operations
+
+
+def apply_gate(states, matrix, qubits, num_qubits):
+    """Applies a gate matrix acting on `qubits` to a batch of statevectors.
+
+    states: complex array of shape (N, 2**num_qubits).
+    returns: a new array of the same shape.
+    """
+    num_samples = states.shape[0]
+    if len(qubits) == 1:
+        q = qubits[0]
+        psi = states.reshape(num_samples * 2 ** (num_qubits - 1 - q), 2, 2 ** q)
+        return np.einsum("ij,ajb->aib", matrix, psi).reshape(num_samples, -1)
+
+    k = len(qubits)
+    psi = states.reshape((num_samples,) + (2,) * num_qubits)
+    axes = [num_qubits - q for q in qubits]  # axis 0 is the sample index
+    gate = matrix.reshape((2,) * (2 * k))
+    psi = np.tensordot(gate, psi, axes=(list(range(k, 2 * k)), axes))
+    psi = np.moveaxis(psi, list(range(k)), axes)
+    return psi.reshape(num_samples, -1)
+
+
+def simulate(circuit, initial_states, num_qubits=None):
+    """Runs a circuit on one statevector or a batch of them.
+
+    initial_states: a single statevector of length 2**n or an (N x 2**n) matrix.
+    returns: the final statevector(s), with the same shape as the input.
+    """
+    instrumentation.count("simulator_runs")
+    states = np.asarray(initial_states, dtype=complex)
+    single = states.ndim == 1
+    states = np.atleast_2d(states)
+    if num_qubits is None:
+        num_qubits = int(np.log2(states.shape[1]))
+
+    for name, qubits, params in circuit_operations(circuit, num_qubits):
+        if name in ("id", "iden"):
+            continue
+        states = apply_gate(states, gate_matrix(name, params), qubits, num_qubits)
+
+    return states[0] if single else states
+
+
+def circuit_key(circuit, num_qubits):
+    """A canonical, hashable description of a circuit's gate sequence.
+
+    Identity gates are dropped, so that e.g. an empty circuit and circ.iden(qr)
+    share a key.
+    """
+    return tuple((name, qubits, params)
+                 for name, qubits, params in circuit_operations(circuit, num_qubits)
+                 if name not in ("id", "iden"))
+
+
+@lru_cache(maxsize=4096)
+def _unitary_from_key(key, num_qubits):
+    instrumentation.count("unitaries_compiled")
+    # row j of the simulated identity is U|j>, i.e. column j of U.
+    unitary = simulate(key, np.eye(2 ** num_qubits, dtype=complex), num_qubits).T.copy()
+    unitary.flags.writeable = False
+    return unitary
+
+
+def unitary_observable(unitary, num_qubits):
+    """U^dagger (Z x ... x Z) U for a circuit unitary U, not cached (see parity_observable)."""
+    return unitary.conj().T @ (parity_signs(num_qubits)[:, None] * unitary)
+
+
+@lru_cache(maxsize=4096)
+def _observable_from_key(key, num_qubits):
+    observable = unitary_observable(_unitary_from_key(key, num_qubits), num_qubits)
+    observable.flags.writeable = False
+    return observable
+
+
+def circuit_unitary(circuit, num_qubits):
+    """The (2**n x 2**n) unitary of a circuit. Results are cached (LRU) by gate sequence."""
+    return _unitary_from_key(circuit_key(circuit, num_qubits), num_qubits)
+
+
+def parity_observable(circuit, num_qubits):
+    """The parity observable seen through the circuit, U^dagger (Z x ... x Z) U.
+
+    Its expectation value on a state psi equals compute_parity_exp_value(U psi).
+    Results are cached (LRU) by gate sequence, which pays off where the same
+    circuits are looked up again (e.g. at inference). A search that visits every
+    circuit once should use the unitaries of canonical_circuits and unitary_observable.
+    """
+    return _observable_from_key(circuit_key(circuit, num_qubits), num_qubits)
+
+
+def observable_expectation(observable, states):
+    """<psi|O|psi> for a single statevector or for each row of a (N x 2**n) matrix."""
+    states = np.asarray(states, dtype=complex)
+    return np.einsum("...i,...i->...", states.conj(), states @ observable.T).real
+
+
+class StatevectorSimulator(object):
+    """Drop-in replacement for BasicAer's statevector_simulator.
+
+    Instead of execute(circ, simulator, backend_options={"initial_statevector": v})
+    use simulator.run(circ, v), where v can also be a matrix with one
+    statevector per row.
+    """
+
+    def run(self, circuit, initial_statevector, num_qubits=None):
+        return simulate(circuit, initial_statevector, num_qubits)
@@ -1,10 +1,10 @@
 #! /usr/bin/env python3
 
 import sys
-import pickle
 
-with open(sys.argv[1], "rb") as f:
-    P = pickle.load(f)
+from problem_store import load_problem, set_hint
+
+P = load_problem(sys.argv[1])
 
 print(f"Writing to hint for problem {P['Name']}.")
 print(P["Hint"])
@@ -20,8 +20,6 @@ def input_lines(prompt=None):
         yield from iter(input, None)
 
 hint = input_lines()
-P["Hint"] = "\n".join(list(hint))
-
 
-with open(sys.argv[1], "wb") as f:
-    pickle.dump(P, f)
+# for a converted .problem directory only the header is rewritten, not the samples.
+set_hint(sys.argv[1], "\n".join(list(hint)))
@@ -0,0 +1,114 @@
+#! /usr/bin/env python3
+"""Problem files stored as memory-mapped arrays.
+
+A .pyz problem file is a pickled dict, and loading it means unpickling every
+training and test statevector as Python lists of complex numbers. A converted
+problem is instead a directory NAME.problem containing
+
+    header.json         everything except the samples: Name, Hint, TimeEst, ...
+    TrainSamples.npy    complex128, one statevector per row
+    TrainLabels.npy     int64
+    TestVectors.npy     complex128
+    TestLabels.npy      int64
+
+load_problem() memory-maps the arrays, so only the rows that are used are
+read from disk, and set_hint() rewrites header.json alone.
+
+Convert problem files with:
+    ./problem_store.py discrete_problem3.pyz [more.pyz ...]
+"""
+import json
+import os
+import pickle
+import sys
+import numpy as np
+
+SAMPLE_KEYS = ("TrainSamples", "TestVectors")
+LABEL_KEYS = ("TrainLabels", "TestLabels")
+HEADER_NAME = "header.json"
+
+
+def problem_paths(name):
+    """The .problem directory and .pyz file names for a problem name or path."""
+    # e.g. a tab completed discrete_problem3.problem/
+    name = name.rstrip(os.sep)
+    for suffix in (".problem", ".pyz"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name + ".problem", name + ".pyz"
+
+
+def problem_path(name):
+    """The file or directory load_problem reads for a problem name or path: the
+    .problem directory if it exists, unless a .pyz file is named explicitly."""
+    problem_dir, pyz_path = problem_paths(name)
+    if name.endswith(".pyz") or not os.path.isdir(problem_dir):
+        return pyz_path
+    return problem_dir
+
+
+def convert(pyz_path, problem_dir=None):
+    """Writes the .problem directory for a pickled .pyz problem file."""
+    if problem_dir is None:
+        problem_dir, _ = problem_paths(pyz_path)
+    with open(pyz_path, "rb") as f:
+        problem = pickle.load(f)
+
+    os.makedirs(problem_dir, exist_ok=True)
+    for key in SAMPLE_KEYS:
+        np.save(os.path.join(problem_dir, key + ".npy"), np.array(problem[key], dtype=np.complex128))
+    for key in LABEL_KEYS:
+        np.save(os.path.join(problem_dir, key + ".npy"), np.array(problem[key], dtype=np.int64))
+
+    header = {key: value for key, value in problem.items() if key not in SAMPLE_KEYS + LABEL_KEYS}
+    _write_header(problem_dir, header)
+    return problem_dir
+
+
+def _write_header(problem_dir, header):
+    # written next to the old header and renamed, so a reader never sees half a file.
+    tmp_path = os.path.join(problem_dir, HEADER_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(header, f, indent=4)
+    os.replace(tmp_path, os.path.join(problem_dir, HEADER_NAME))
+
+
+def load_problem(name):
+    """Loads a problem by name ("discrete_problem3") or path (.problem or .pyz).
+
+    Unless a .pyz file is named explicitly, the converted .problem directory is
+    preferred if it exists. Either way the result is a dict with the keys of the
+    original problem file; from a .problem directory the samples and labels are
+    read-only memory-mapped arrays.
+    """
+    path = problem_path(name)
+    if path.endswith(".pyz"):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    with open(os.path.join(path, HEADER_NAME)) as f:
+        problem = json.load(f)
+    for key in SAMPLE_KEYS + LABEL_KEYS:
+        problem[key] = np.load(os.path.join(path, key + ".npy"), mmap_mode="r")
+    return problem
+
+
+def set_hint(name, hint):
+    """Replaces the hint of a problem. For a .problem directory only the header is rewritten."""
+    path = problem_path(name)
+    if not path.endswith(".pyz"):
+        with open(os.path.join(path, HEADER_NAME)) as f:
+            header = json.load(f)
+        header["Hint"] = hint
+        _write_header(path, header)
+    else:
+        with open(path, "rb") as f:
+            problem = pickle.load(f)
+        problem["Hint"] = hint
+        with open(path, "wb") as f:
+            pickle.dump(problem, f)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(f"Converted {path} to {convert(path)}")
@@ -0,0 +1,26 @@
+"""batch.py runs every job of a manifest, in one process or in a pool."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_discrete_solver_jobs(tmp_path, workers):
+    # the solver is looked up once to import it, and again for every job.
+    problem = os.path.join(ROOT, "discrete_problem1.pyz")
+    jobs = [{"solver": "discrete_solver", "problem": problem, "sample_limit": 20, "seed": seed}
+            for seed in range(2)]
+    (tmp_path / "manifest.jsonl").write_text("\n".join(json.dumps(job) for job in jobs))
+
+    subprocess.run([sys.executable, os.path.join(ROOT, "batch.py"), "manifest.jsonl",
+                    "--results", "results.jsonl", "--workers", str(workers)],
+                   cwd=tmp_path, check=True, capture_output=True)
+
+    records = [json.loads(line) for line in (tmp_path / "results.jsonl").read_text().splitlines()]
+    assert [record["status"] for record in records] == ["ok", "ok"], records
+    assert all(record["test_accuracy"] == 100.0 for record in records)
@@ -0,0 +1,75 @@
+"""An interrupted training resumes from its checkpoint."""
+import pickle
+
+import numpy as np
+import pytest
+
+from example_solutions.checkpoint import Checkpoint
+from example_solutions.continuous_solver import continuous_solver
+from example_solutions.discrete_solver import _exhaustive_search
+from example_solutions.gates import Gate
+
+GATES = [Gate("h", (0,)), Gate("x", (1,)), Gate("s", (2,)), Gate("cx", (0, 1)), Gate("cx", (1, 2))]
+
+
+class _InterruptedCheckpoint(Checkpoint):
+    """Raises KeyboardInterrupt (like Ctrl-C) at the stop-th time a save could be due."""
+
+    def __init__(self, path, stop):
+        super().__init__(path, interval=3600.0)
+        self.stop = stop
+        self.calls = 0
+
+    def due(self):
+        self.calls += 1
+        if self.calls == self.stop:
+            raise KeyboardInterrupt()
+        return super().due()
+
+
+def test_exhaustive_search_resumes_where_it_stopped(tmp_path):
+    rng = np.random.RandomState(0)
+    vectors = rng.normal(size=(20, 8)) + 1j * rng.normal(size=(20, 8))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    labels = rng.choice([-1.0, 1.0], size=20)
+    expected = _exhaustive_search(GATES, vectors, labels, 4, 3, None)
+
+    path = str(tmp_path / "search.ckpt")
+    with pytest.raises(KeyboardInterrupt):
+        _exhaustive_search(GATES, vectors, labels, 4, 3, None, checkpoint=_InterruptedCheckpoint(path, 100))
+
+    # a checkpoint of another training is ignored.
+    other = _InterruptedCheckpoint(path, stop=0)
+    other.resume = True
+    _exhaustive_search(GATES, vectors, -labels, 4, 3, None, checkpoint=other)
+    assert other.calls == expected[2]
+
+    # the 99 circuits scored before the interruption are not scored again.
+    resumed = _InterruptedCheckpoint(path, stop=0)
+    resumed.resume = True
+    assert _exhaustive_search(GATES, vectors, labels, 4, 3, None, checkpoint=resumed) == expected
+    assert resumed.calls == expected[2] - 99
+
+
+def test_continuous_optimisation_resumes_from_its_best_point(tmp_path):
+    rng = np.random.RandomState(1)
+    vectors = rng.normal(size=(12, 4)) + 1j * rng.normal(size=(12, 4))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    training_data = list(zip(vectors, rng.choice([-1.0, 1.0], size=12)))
+
+    path = str(tmp_path / "optimisation.ckpt")
+    with pytest.raises(KeyboardInterrupt):
+        continuous_solver(training_data, depth=1, checkpoint=_InterruptedCheckpoint(path, 20))
+    with open(path, "rb") as f:
+        saved = pickle.load(f)["state"]
+    assert saved["evaluations"] == 20
+
+    resumed = _InterruptedCheckpoint(path, 1)
+    resumed.resume = True
+    with pytest.raises(KeyboardInterrupt):
+        continuous_solver(training_data, depth=1, checkpoint=resumed)
+    with open(path, "rb") as f:
+        state = pickle.load(f)["state"]
+    # one more loss evaluation, starting from the saved best parameters.
+    assert state["evaluations"] == 21
+    assert state["loss"] <= saved["loss"] + 1e-12
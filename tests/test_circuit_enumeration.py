@@ -0,0 +1,15 @@
+import numpy as np
+
+from example_solutions.circuit_enumeration import canonical_circuits
+from example_solutions.gates import Gate
+from example_solutions.statevector import circuit_unitary, parity_observable, unitary_observable
+
+GATES = [Gate("h", (0,)), Gate("t", (1,)), Gate("cx", (0, 1)), Gate("ry", (2,), (0.3,)), Gate("cz", (1, 2))]
+
+
+def test_enumerated_unitaries_are_the_circuit_unitaries():
+    pairs = list(canonical_circuits(GATES, 3, 3, with_unitaries=True))
+    assert [circuit for circuit, _ in pairs] == list(canonical_circuits(GATES, 3, 3))
+    for circuit, unitary in pairs:
+        assert np.allclose(unitary, circuit_unitary(circuit, 3))
+        assert np.allclose(unitary_observable(unitary, 3), parity_observable(circuit, 3))
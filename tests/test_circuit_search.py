@@ -0,0 +1,28 @@
+"""The prefix tree search against the exhaustive one."""
+import numpy as np
+
+from example_solutions.circuit_search import prefix_tree_search
+from example_solutions.discrete_solver import _exhaustive_search
+from example_solutions.gates import Gate
+from example_solutions.statevector import observable_expectation, parity_observable
+
+GATES = [Gate("h", (0,)), Gate("x", (1,)), Gate("s", (2,)), Gate("cx", (0, 1)), Gate("cx", (1, 2))]
+
+
+def test_prefix_tree_scores_the_exhaustive_circuits():
+    rng = np.random.RandomState(0)
+    vectors = rng.normal(size=(30, 8)) + 1j * rng.normal(size=(30, 8))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    labels = np.sign(observable_expectation(parity_observable((GATES[0], GATES[3], GATES[4]), 3), vectors))
+
+    circuit, cost, num_scored = prefix_tree_search(GATES, vectors, labels, 4, 3)
+    _, exhaustive_cost, num_circuits = _exhaustive_search(GATES, vectors, labels, 4, 3, None)
+    assert num_scored == num_circuits
+    assert np.isclose(cost, exhaustive_cost)
+    expected = observable_expectation(parity_observable(circuit, 3), vectors)
+    assert np.isclose(cost, np.sum(np.abs(labels - expected)))
+
+    # stops at a circuit that gets every label right.
+    circuit, _, stopped_after = prefix_tree_search(GATES, vectors, labels, 4, 3, stop_accuracy=1.0)
+    assert stopped_after < num_scored
+    assert np.all(np.sign(observable_expectation(parity_observable(circuit, 3), vectors)) == labels)
@@ -0,0 +1,68 @@
+"""continuous_solver: its circuit, the adaptive depth search and checkpoints."""
+import numpy as np
+import pytest
+
+from example_solutions.checkpoint import Checkpoint
+from example_solutions.continuous_solver import (ANSATZES, adaptive_optimize, compile_ansatz, continuous_solver,
+                                                 continuous_inference, grow_parameters, objective_function)
+from example_solutions.helper_functions import compute_parity_exp_value
+from example_solutions.statevector import circuit_unitary
+
+
+def _random_data(num_qubits, num_samples, seed):
+    rng = np.random.RandomState(seed)
+    vectors = rng.normal(size=(num_samples, 2 ** num_qubits)) + 1j * rng.normal(size=(num_samples, 2 ** num_qubits))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, rng.choice([-1.0, 1.0], size=num_samples)
+
+
+def test_new_layer_starts_as_the_identity():
+    vectors, labels = _random_data(3, 16, seed=0)
+    rng = np.random.RandomState(1)
+    for ansatz in ANSATZES.values():
+        for depth in range(3):
+            program = compile_ansatz(3, depth, ansatz, growable=True)
+            deeper = compile_ansatz(3, depth + 1, ansatz, growable=True)
+            params = rng.uniform(0.0, 2.0 * np.pi, size=program.num_params)
+
+            np.testing.assert_allclose(deeper.predict(grow_parameters(params, deeper), vectors),
+                                       program.predict(params, vectors), atol=1e-10)
+            assert np.isclose(objective_function(grow_parameters(params, deeper), deeper, vectors, labels),
+                              objective_function(params, program, vectors, labels))
+
+
+def test_inference_circuit_is_the_trained_program():
+    vectors, _ = _random_data(3, 10, seed=5)
+    program = compile_ansatz(3, 2, ANSATZES["controlled_h"])
+    params = np.random.RandomState(6).uniform(0.0, 2.0 * np.pi, size=program.num_params)
+
+    circuit = continuous_inference(program.gate_list, 3, params)["infer_circ"]
+    expected = compute_parity_exp_value(vectors @ circuit_unitary(circuit, 3).T)
+    np.testing.assert_allclose(program.predict(params, vectors), expected, atol=1e-10)
+
+
+def test_deeper_search_is_never_worse():
+    # the same start at depth 0, so the search to depth 1 continues from that optimum.
+    vectors, labels = _random_data(3, 24, seed=2)
+    np.random.seed(3)
+    _, _, shallow_loss = adaptive_optimize(vectors, labels, ANSATZES["hardware_efficient"], 0, 0, maxiter=50)
+    np.random.seed(3)
+    _, _, deep_loss = adaptive_optimize(vectors, labels, ANSATZES["hardware_efficient"], 0, 1, maxiter=50)
+    assert deep_loss <= shallow_loss + 1e-9
+
+
+def test_max_depth_below_the_starting_depth():
+    vectors, labels = _random_data(2, 8, seed=4)
+    with pytest.raises(ValueError):
+        adaptive_optimize(vectors, labels, ANSATZES["hardware_efficient"], 2, 1)
+
+
+@pytest.mark.parametrize("first, second", [({"max_depth": 1}, {}), ({}, {"max_depth": 1})])
+def test_adaptive_and_fixed_depth_checkpoints_are_kept_apart(tmp_path, first, second):
+    vectors, labels = _random_data(2, 8, seed=7)
+    training_data = list(zip(vectors, labels))
+    path = str(tmp_path / "continuous.ckpt")
+    continuous_solver(training_data, depth=1, maxiter=5, checkpoint=Checkpoint(path, interval=0.0), **first)
+    # the other search ignores the checkpoint, rather than loading a state it cannot use.
+    result = continuous_solver(training_data, depth=1, maxiter=5, checkpoint=Checkpoint(path, resume=True), **second)
+    assert callable(result["infer_fun"])
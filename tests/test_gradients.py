@@ -0,0 +1,23 @@
+"""The adjoint gradient against finite differences."""
+import numpy as np
+import pytest
+
+from example_solutions.continuous_solver import ANSATZES, compile_ansatz
+from example_solutions.gradients import loss_and_gradient
+
+
+@pytest.mark.parametrize("ansatz", sorted(ANSATZES))
+def test_adjoint_gradient_equals_finite_differences(ansatz):
+    rng = np.random.RandomState(0)
+    vectors = rng.normal(size=(12, 8)) + 1j * rng.normal(size=(12, 8))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    labels = np.sign(rng.normal(size=12))
+    program = compile_ansatz(3, 2, ANSATZES[ansatz])
+    params = rng.uniform(0, 2 * np.pi, program.num_params)
+
+    loss, gradient = loss_and_gradient(program, params, vectors, labels)
+    step = 1e-6
+    expected = [(loss_and_gradient(program, params + step * e, vectors, labels)[0] -
+                 loss_and_gradient(program, params - step * e, vectors, labels)[0]) / (2 * step)
+                for e in np.eye(len(params))]
+    np.testing.assert_allclose(gradient, expected, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,41 @@
+"""Restarts stop as soon as one of them reaches the target loss."""
+import multiprocessing
+
+import numpy as np
+
+from example_solutions import multistart
+from example_solutions.continuous_solver import compile_ansatz, objective_function
+
+
+def _random_data(num_samples, seed):
+    rng = np.random.RandomState(seed)
+    vectors = rng.normal(size=(num_samples, 4)) + 1j * rng.normal(size=(num_samples, 4))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, rng.choice([-1.0, 1.0], size=num_samples)
+
+
+def test_cancelled_restart_reports_its_best_point(monkeypatch):
+    vectors, labels = _random_data(10, seed=0)
+    stop_event = multiprocessing.Event()
+    stop_event.set() # another restart has reached the target.
+    monkeypatch.setattr(multistart, "_worker_state", {"vectors": vectors, "labels": labels, "stop_event": stop_event})
+
+    report = multistart._run_restart({"seed": 1, "depth": 1, "maxiter": 1000}, target_loss=None)
+    assert report["cancelled"]
+    program = compile_ansatz(2, 1)
+    # stopped at the first loss evaluation, at the starting point.
+    expected = np.random.RandomState(1).uniform(0.0, 2.0 * np.pi, size=program.num_params)
+    np.testing.assert_allclose(report["params"], expected)
+    assert np.isclose(report["loss"], objective_function(report["params"], program, vectors, labels))
+
+
+def test_target_loss_stops_every_restart():
+    vectors, labels = _random_data(10, seed=2)
+    configs = [{"seed": seed, "depth": 1, "maxiter": 1000} for seed in range(3)]
+    # every starting point is good enough.
+    reports = multistart.multistart_optimize(vectors, labels, configs, target_loss=np.inf, max_workers=2)
+    assert [report["seed"] for report in reports] == [0, 1, 2]
+    program = compile_ansatz(2, 1)
+    for report in reports:
+        assert not report["cancelled"]
+        assert np.isclose(report["loss"], objective_function(report["params"], program, vectors, labels))
@@ -0,0 +1,29 @@
+"""The parallel exhaustive search finds what the serial one does."""
+import numpy as np
+import pytest
+
+from example_solutions.discrete_solver import _exhaustive_search
+from example_solutions.gates import Gate
+from example_solutions.parallel_search import parallel_exhaustive_search
+from example_solutions.statevector import observable_expectation, parity_observable
+
+GATES = [Gate("h", (0,)), Gate("h", (1,)), Gate("s", (2,)), Gate("cx", (0, 1)), Gate("cx", (1, 2)),
+         Gate("ry", (0,), (0.4,))]
+
+
+def _data(num_states, seed):
+    rng = np.random.RandomState(seed)
+    vectors = rng.normal(size=(num_states, 8)) + 1j * rng.normal(size=(num_states, 8))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    target = (GATES[0], GATES[4])
+    labels = np.sign(observable_expectation(parity_observable(target, 3), vectors))
+    return vectors, labels
+
+
+@pytest.mark.parametrize("stop_accuracy", [None, 1.0])
+def test_parallel_results_identical_to_serial(stop_accuracy):
+    vectors, labels = _data(40, seed=0)
+    serial = _exhaustive_search(GATES, vectors, labels, 3, 3, stop_accuracy)
+    parallel = parallel_exhaustive_search(GATES, vectors, labels, 3, 3, stop_accuracy,
+                                          max_workers=2, chunk_size=7)
+    assert parallel == serial
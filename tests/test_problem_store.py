@@ -0,0 +1,42 @@
+"""Converting problems to .problem directories and loading them back."""
+import os
+import shutil
+
+import numpy as np
+
+from problem_store import convert, load_problem, problem_path, problem_paths, set_hint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_problem_paths():
+    expected = ("discrete_problem3.problem", "discrete_problem3.pyz")
+    for name in ("discrete_problem3", "discrete_problem3.pyz", "discrete_problem3.problem",
+                 "discrete_problem3.problem" + os.sep):
+        assert problem_paths(name) == expected
+
+
+def test_convert_and_load(tmp_path):
+    pyz_path = str(tmp_path / "discrete_problem0.pyz")
+    shutil.copy(os.path.join(ROOT, "discrete_problem0.pyz"), pyz_path)
+    original = load_problem(pyz_path)
+    problem_dir = convert(pyz_path)
+    assert problem_dir == str(tmp_path / "discrete_problem0.problem")
+
+    for name in (str(tmp_path / "discrete_problem0"), problem_dir + os.sep):
+        assert problem_path(name) == problem_dir
+        problem = load_problem(name)
+        assert isinstance(problem["TrainSamples"], np.memmap)
+        for key, value in original.items():
+            if key in ("TrainSamples", "TrainLabels", "TestVectors", "TestLabels"):
+                np.testing.assert_array_equal(problem[key], value)
+            else:
+                assert problem[key] == value
+    # a .pyz file named explicitly is still read.
+    assert problem_path(pyz_path) == pyz_path
+
+    set_hint(problem_dir, "a new hint")
+    assert load_problem(problem_dir)["Hint"] == "a new hint"
+    assert load_problem(pyz_path)["Hint"] == original["Hint"]
+    set_hint(pyz_path, "another hint")
+    assert load_problem(pyz_path)["Hint"] == "another hint"
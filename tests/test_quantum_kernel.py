@@ -0,0 +1,34 @@
+"""The kernels of quantum_kernel, against their definitions."""
+import numpy as np
+
+from example_solutions.helper_functions import parity_signs
+from example_solutions.quantum_kernel import kernel_matrix, quantum_kernel_svm
+
+
+def _random_states(num_states, num_qubits, seed):
+    rng = np.random.RandomState(seed)
+    states = rng.normal(size=(num_states, 2 ** num_qubits)) + 1j * rng.normal(size=(num_states, 2 ** num_qubits))
+    return states / np.linalg.norm(states, axis=1, keepdims=True)
+
+
+def test_kernels_in_blocks():
+    a, b = _random_states(7, 3, seed=0), _random_states(5, 3, seed=1)
+    even = np.diag((parity_signs(3) > 0).astype(complex))
+    odd = np.eye(8) - even
+    expected = {
+        "fidelity": np.abs(a.conj() @ b.T) ** 2,
+        "parity": np.abs(a.conj() @ even @ b.T) ** 2 + np.abs(a.conj() @ odd @ b.T) ** 2,
+        "probabilities": np.abs(a) ** 2 @ (np.abs(b) ** 2).T,
+    }
+    for kernel, matrix in expected.items():
+        np.testing.assert_allclose(kernel_matrix(a, b, kernel, block_size=3), matrix, atol=1e-12)
+
+
+def test_gram_matrix_cache(tmp_path):
+    states = _random_states(20, 2, seed=2)
+    training_data = list(zip(states, np.where(np.arange(20) % 2 == 0, 1, -1)))
+    quantum_kernel_svm(training_data, cache_dir=str(tmp_path), cache_size_mb=0)
+    # beyond the size bound, the entry is evicted right away.
+    assert list(tmp_path.iterdir()) == []
+    quantum_kernel_svm(training_data, cache_dir=str(tmp_path))
+    assert len(list(tmp_path.glob("fidelity_*.npy"))) == 1
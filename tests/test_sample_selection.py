@@ -0,0 +1,37 @@
+"""The compressed search finds the circuit of the exhaustive search."""
+import numpy as np
+
+from example_solutions.discrete_solver import _exhaustive_search
+from example_solutions.gates import Gate
+from example_solutions.sample_selection import compressed_search, deduplicate
+from example_solutions.statevector import observable_expectation, parity_observable
+
+GATES = [Gate("h", (0,)), Gate("h", (1,)), Gate("x", (2,)), Gate("s", (1,)), Gate("cx", (0, 1)), Gate("cx", (1, 2))]
+
+
+def _data(seed):
+    rng = np.random.RandomState(seed)
+    vectors = rng.normal(size=(60, 8)) + 1j * rng.normal(size=(60, 8))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    labels = np.sign(observable_expectation(parity_observable((GATES[1], GATES[4], GATES[5]), 3), vectors))
+    labels[:6] *= -1 # no circuit is perfect.
+    # repeats of some samples, with another global phase.
+    repeats = rng.choice(60, size=40)
+    return (np.concatenate([vectors, vectors[repeats] * np.exp(1j * rng.uniform(0, 2 * np.pi, size=(40, 1)))]),
+            np.concatenate([labels, labels[repeats]]))
+
+
+def test_deduplicate():
+    vectors, labels = _data(0)
+    keep, weights = deduplicate(vectors, labels)
+    np.testing.assert_array_equal(keep, np.arange(60))
+    assert weights.sum() == len(labels)
+
+
+def test_compressed_search_equals_exhaustive():
+    for seed in range(3):
+        vectors, labels = _data(seed)
+        circuit, cost, num_circuits = compressed_search(GATES, vectors, labels, 4, 3, initial_samples=4)
+        expected = _exhaustive_search(GATES, vectors, labels, 4, 3, None)
+        assert circuit == expected[0] and num_circuits == expected[2]
+        assert np.isclose(cost, expected[1])
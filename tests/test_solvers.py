@@ -0,0 +1,26 @@
+"""Looking up the solvers of example_solutions by name."""
+import importlib
+import os
+
+import pytest
+
+import evaluate
+import example_solutions
+from problem_store import load_problem
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_get_solver():
+    assert example_solutions.get_solver("discrete_solver").__name__ == "discrete_solver"
+    with pytest.raises(ValueError):
+        example_solutions.get_solver("no_such_solver")
+
+
+def test_evaluate_after_the_solver_module_was_imported():
+    # the package attribute discrete_solver may now be the module.
+    importlib.import_module("example_solutions.discrete_solver")
+
+    problem = load_problem(os.path.join(ROOT, "discrete_problem0.pyz"))
+    result = evaluate.evaluate(problem, "discrete_problem0", "discrete_solver", 20, seed=0)
+    assert result["test_accuracy"] == 100.0
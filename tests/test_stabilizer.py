@@ -0,0 +1,31 @@
+"""The stabilizer engine against the dense statevector simulator."""
+import itertools
+
+import numpy as np
+
+from example_solutions.gates import Gate
+from example_solutions.stabilizer import Tableau, clifford_search, pauli_expectation
+from example_solutions.statevector import observable_expectation, parity_observable
+
+GATES = [Gate(name, (q,)) for name in ("h", "s", "sdg", "x", "y", "z") for q in range(3)] + \
+        [Gate("cx", (0, 2)), Gate("cx", (2, 1)), Gate("cz", (0, 1)), Gate("swap", (1, 2))]
+
+
+def test_pauli_expectation_equals_the_dense_observable():
+    rng = np.random.RandomState(0)
+    states = rng.normal(size=(10, 8)) + 1j * rng.normal(size=(10, 8))
+    states /= np.linalg.norm(states, axis=1, keepdims=True)
+    for circuit in itertools.islice(itertools.product(GATES, repeat=3), 0, None, 37):
+        pauli = Tableau.from_circuit(circuit, 3).parity_observable()
+        dense = observable_expectation(parity_observable(circuit, 3), states)
+        np.testing.assert_allclose(pauli_expectation(pauli, states), dense, atol=1e-12)
+
+
+def test_clifford_search_cost_is_the_dense_cost():
+    rng = np.random.RandomState(1)
+    states = rng.normal(size=(30, 8)) + 1j * rng.normal(size=(30, 8))
+    states /= np.linalg.norm(states, axis=1, keepdims=True)
+    labels = np.sign(rng.normal(size=30))
+    circuit, cost, _, _ = clifford_search(GATES, states, labels, 2, 3)
+    dense = observable_expectation(parity_observable(circuit, 3), states)
+    assert np.isclose(cost, np.sum(np.abs(labels - dense)))
@@ -0,0 +1,33 @@
+"""The key and the size bound of the training cache."""
+import os
+
+import numpy as np
+
+import training_cache
+from example_solutions.discrete_solver import discrete_solver
+
+
+def test_key_covers_the_whole_package(monkeypatch):
+    cache = training_cache.TrainingCache()
+    vectors, labels = np.eye(4, dtype=complex), np.ones(4)
+    key = cache.key(discrete_solver, vectors, labels, seed=0)
+    assert cache.key(discrete_solver, vectors, labels, seed=0) == key
+    assert cache.key(discrete_solver, vectors, labels, seed=1) != key
+
+    # an edit to a helper module the solver uses, rather than to the solver's own module.
+    sources = training_cache._package_sources(discrete_solver)
+    assert any(source.startswith(b"statevector.py\0") for source in sources)
+    edited = [source + b"\n# edited" if source.startswith(b"statevector.py\0") else source for source in sources]
+    monkeypatch.setattr(training_cache, "_package_sources", lambda solver: edited)
+    assert cache.key(discrete_solver, vectors, labels, seed=0) != key
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = training_cache.TrainingCache(str(tmp_path))
+    assert cache.store("a", [0] * 100, 1.0) and cache.store("b", [1] * 100, 1.0)
+    os.utime(tmp_path / "a.pkl", (0, 0))
+    # room for two entries of this size.
+    cache.max_bytes = 2 * os.path.getsize(tmp_path / "b.pkl")
+    assert cache.store("c", [2] * 100, 1.0)
+    assert cache.load("a") is None
+    assert cache.load("b")["artifact"] == [1] * 100 and cache.load("c")["artifact"] == [2] * 100
@@ -0,0 +1,91 @@
+"""Trained solutions cached on disk, so that evaluate.py does not train twice.
+
+A solver that returns an artifact (see helper_functions.inference_retval) has
+it pickled to DIRECTORY/KEY.pkl. The key is a hash of
+
+    the source code of the solver's package (all of example_solutions, as the
+    solvers depend on the simulator, the enumeration, ...), or of its module
+    if it is not in a package,
+    the training vectors and labels it was given (so the problem and sample limit),
+    the seed and any keyword arguments of the solver,
+
+so editing the solvers or their helpers, or training on other data, misses the
+cache, while changes to evaluate.py do not. Once the directory grows beyond
+max_bytes the least recently used entries are deleted.
+
+Only seeded trainings are worth caching: evaluate.py does not use the cache
+without a seed, so that a rerun of a random training trains again.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import time
+
+from example_solutions.disk_cache import evict, hash_data, replace_file
+
+
+def _package_sources(solver):
+    """The source files of the package that defines solver, in a fixed order."""
+    module = sys.modules[solver.__module__]
+    package = sys.modules.get(module.__name__.partition(".")[0])
+    if package is None or not hasattr(package, "__path__"):
+        return [inspect.getsource(module).encode()]
+
+    sources = []
+    for directory in package.__path__:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        sources.append(os.path.relpath(path, directory).encode() + b"\0" + f.read())
+    return sources
+
+
+class TrainingCache(object):
+
+    def __init__(self, directory=".training_cache", max_bytes=512 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, solver, vectors, labels, seed=None, solver_kwargs=None):
+        digest = hashlib.blake2b(digest_size=20)
+        for source in _package_sources(solver):
+            digest.update(source)
+        digest.update(solver.__name__.encode())
+        hash_data(digest, vectors, labels)
+        digest.update(repr((seed, sorted((solver_kwargs or {}).items()))).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def load(self, key):
+        """The cached entry, a dict with "artifact" and "training_time", or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # e.g. written by an older version of the solver's classes.
+            os.remove(path)
+            return None
+        os.utime(path) # most recently used.
+        return entry
+
+    def store(self, key, artifact, training_time):
+        """Saves the artifact, returns False if it cannot be pickled."""
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            data = pickle.dumps({"artifact": artifact, "training_time": training_time, "created": time.time()})
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+
+        replace_file(self._path(key), lambda f: f.write(data))
+        evict(self.directory, ".pkl", self.max_bytes)
+        return True